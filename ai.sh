@@ -2,7 +2,7 @@ export INPUT_PROMPT=$1
 [[ -z $INPUT_PROMPT ]] && \
 	export INPUT_PROMPT="Suggest 1 thing to improve the program."
 [[ -z $DEBUG ]] && alias curl='echo' || unalias curl
-curl -X POST 'https://api.anthropic.com/v1/messages' \
+curl -X POST "${BLENDEROCC_AI_ENDPOINT:-https://api.anthropic.com/v1/messages}" \
   -H "x-api-key: $ANTHROPIC_API_KEY" \
   -H "anthropic-version: 2023-06-01" \
   -H "content-type: application/json" \
@@ -0,0 +1,179 @@
+"""Minimal stand-in for the parts of bpy the addon touches, so OCCUtils and the
+custom commands can run outside Blender. install() registers it as 'bpy'."""
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+class Elements:
+    """Vertex, loop or polygon collection with Blender's add/foreach_get/foreach_set"""
+    def __init__(self, mesh, **fields):
+        self.mesh = mesh
+        self.fields = {name: np.zeros((0, width), dtype=dtype) for name, (width, dtype) in fields.items()}
+
+    def __len__(self):
+        return len(next(iter(self.fields.values())))
+
+    def add(self, count):
+        for name, array in self.fields.items():
+            self.fields[name] = np.concatenate([array, np.zeros((count, array.shape[1]), dtype=array.dtype)])
+
+    def foreach_get(self, name, buffer):
+        buffer[...] = self.fields[name].ravel()
+
+    def foreach_set(self, name, buffer):
+        self.fields[name][...] = np.asarray(buffer).reshape(self.fields[name].shape)
+        if name == 'loop_start':
+            starts = self.fields['loop_start'][:, 0]
+            self.fields['loop_total'][:, 0] = np.diff(np.append(starts, len(self.mesh.loops)))
+
+class ID:
+    """Custom properties, as on any datablock"""
+    def __getitem__(self, key):
+        return self.props[key]
+
+    def __setitem__(self, key, value):
+        self.props[key] = value
+
+    def __delitem__(self, key):
+        del self.props[key]
+
+    def __contains__(self, key):
+        return key in self.props
+
+    def get(self, key, default=None):
+        return self.props.get(key, default)
+
+class Mesh(ID):
+    def __init__(self, name):
+        self.props = {}
+        self.name = name
+        self.users = 0
+        self.vertices = Elements(self, co=(3, np.float32))
+        self.loops = Elements(self, vertex_index=(1, np.int32))
+        self.polygons = Elements(self, loop_start=(1, np.int32), loop_total=(1, np.int32))
+
+    def update(self, calc_edges=False):
+        pass
+
+    def copy(self):
+        mesh = data.meshes.new(self.name)
+        for source, target in ((self.vertices, mesh.vertices), (self.loops, mesh.loops), (self.polygons, mesh.polygons)):
+            target.fields = {name: array.copy() for name, array in source.fields.items()}
+        return mesh
+
+class Object(ID):
+    def __init__(self, name, mesh):
+        self.props = {}
+        self.name = name
+        self.data = mesh
+        self.type = 'MESH'
+        self.matrix_world = np.eye(4)
+        if mesh is not None:
+            mesh.users += 1
+
+    @property
+    def bound_box(self):
+        co = self.data.vertices.fields['co']
+        if not len(co):
+            return [(0.0, 0.0, 0.0)] * 8
+        lo, hi = co.min(axis=0), co.max(axis=0)
+        return [(x, y, z) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])]
+
+class Text:
+    def __init__(self, name):
+        self.name = name
+        self.body = ""
+
+    def as_string(self):
+        return self.body
+
+    def from_string(self, body):
+        self.body = body
+
+    def write(self, body):
+        self.body += body
+
+class Collection(dict):
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+
+    def new(self, name, *args):
+        unique, i = name, 0
+        while unique in self:
+            i += 1
+            unique = f"{name}.{i:03d}"
+        self[unique] = item = self.factory(unique, *args)
+        return item
+
+    def remove(self, item):
+        self.pop(item.name, None)
+
+    def __iter__(self):
+        return iter(list(self.values()))
+
+class Timers:
+    def __init__(self):
+        self.registered = []
+
+    def register(self, func, first_interval=0.0):
+        self.registered.append(func)
+
+    # by identity, as Blender does: a fresh bound method is never registered
+    def is_registered(self, func):
+        return any(registered is func for registered in self.registered)
+
+    def unregister(self, func):
+        self.registered = [registered for registered in self.registered if registered is not func]
+
+def _property(*args, **kwargs):
+    return None
+
+class _Registrable:
+    pass
+
+data = SimpleNamespace(
+    meshes=Collection(Mesh),
+    objects=Collection(Object),
+    texts=Collection(Text),
+    workspaces={},
+)
+scene = SimpleNamespace(
+    collection=SimpleNamespace(objects=SimpleNamespace(link=lambda obj: None)),
+    occ_background=False,
+    occ_lod='medium',
+    ai_message="",
+)
+context = SimpleNamespace(
+    scene=scene,
+    selected_objects=[],
+    active_object=None,
+    window_manager=SimpleNamespace(clipboard="", windows=[]),
+    screen=None,
+)
+types = SimpleNamespace(
+    Operator=type('Operator', (_Registrable,), {}),
+    Panel=type('Panel', (_Registrable,), {}),
+    Menu=type('Menu', (_Registrable,), {}),
+    Scene=SimpleNamespace(),
+    Object=Object,
+    TEXT_MT_editor_menus=SimpleNamespace(append=lambda func: None, remove=lambda func: None),
+)
+props = SimpleNamespace(**{name: _property for name in (
+    'StringProperty', 'BoolProperty', 'IntProperty', 'FloatProperty', 'EnumProperty', 'PointerProperty')})
+app = SimpleNamespace(timers=Timers(), handlers=SimpleNamespace(depsgraph_update_post=[], persistent=lambda func: func), background=True)
+utils = SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None)
+path = SimpleNamespace(abspath=lambda p: p)
+
+class ExportHelper:
+    filepath = ""
+
+class ImportHelper:
+    filepath = ""
+
+def install():
+    sys.modules.setdefault('bpy', sys.modules[__name__])
+    sys.modules.setdefault('bpy_extras', SimpleNamespace(io_utils=SimpleNamespace(ExportHelper=ExportHelper, ImportHelper=ImportHelper)))
+    sys.modules.setdefault('bpy_extras.io_utils', sys.modules['bpy_extras'].io_utils)
+    return sys.modules['bpy']
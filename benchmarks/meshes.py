@@ -0,0 +1,82 @@
+"""Synthetic closed meshes for benchmarking, as flat buffers in the layout
+OCCUtils.mesh_buffers returns: verts, loop_start, loop_total, loop_verts."""
+import numpy as np
+
+def _buffers(verts, *groups):
+    loop_verts = np.concatenate([group.ravel() for group in groups]).astype(np.int32)
+    loop_total = np.concatenate([np.full(len(group), group.shape[1]) for group in groups]).astype(np.int32)
+    loop_start = (np.cumsum(loop_total) - loop_total).astype(np.int32)
+    return np.asarray(verts, dtype=np.float64), loop_start, loop_total, loop_verts
+
+def grid_quads(rows, cols, index):
+    """Quads of a rows x cols grid of cells, wound counter-clockwise in (row, col)"""
+    r, c = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+    return np.stack([index(r, c), index(r + 1, c), index(r + 1, c + 1), index(r, c + 1)], axis=-1).reshape(-1, 4)
+
+def subdivided_cube(faces):
+    """Cube of side 2 with each side split into an n x n quad grid"""
+    n = max(int(np.sqrt(faces / 6)), 1)
+    t = np.linspace(-1, 1, n + 1)
+    u, v = np.meshgrid(t, t, indexing='ij')
+    axes = np.eye(3)
+    # (normal, u axis, v axis) with u x v pointing outwards
+    sides = [(0, 1, 2), (1, 2, 0), (2, 0, 1)]
+    points, quads = [], []
+    for normal, a, b in sides:
+        for sign in (1, -1):
+            ua, va = (axes[a], axes[b]) if sign > 0 else (axes[b], axes[a])
+            side = sign * axes[normal] + u[..., None] * ua + v[..., None] * va
+            base = sum(len(p) for p in points)
+            points.append(side.reshape(-1, 3))
+            quads.append(grid_quads(n, n, lambda i, j, base=base: base + i * (n + 1) + j))
+    points = np.concatenate(points)
+    # sides share their border points, weld them so the cube is closed
+    _, first, inverse = np.unique(np.round(points * n * 4).astype(np.int64), axis=0, return_index=True, return_inverse=True)
+    return _buffers(points[first], inverse.reshape(-1)[np.concatenate(quads)])
+
+def uv_sphere(faces, radius=1.0):
+    """Latitude-longitude sphere, quads between triangle fans at the poles"""
+    return _buffers(*_sphere_groups(faces, radius))
+
+def _sphere_groups(faces, radius):
+    rings = max(int(np.sqrt(faces / 2)), 3)
+    segments = max(faces // rings, 3)
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, rings + 1)[1:-1], np.linspace(0, 2 * np.pi, segments, endpoint=False), indexing='ij')
+    ring = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1).reshape(-1, 3)
+    verts = np.vstack([[0, 0, 1], ring, [0, 0, -1]]) * radius
+    index = lambda r, s: 1 + r * segments + s % segments
+    s = np.arange(segments)
+    south = len(verts) - 1
+    north_fan = np.stack([np.zeros_like(s), index(0, s), index(0, s + 1)], axis=-1)
+    south_fan = np.stack([index(rings - 2, s + 1), index(rings - 2, s), np.full_like(s, south)], axis=-1)
+    return verts, north_fan, grid_quads(rings - 2, segments, index), south_fan
+
+def noisy_scan(faces, noise=0.01, seed=0):
+    """Triangulated sphere with radial noise, like a cleaned-up 3D scan"""
+    verts, north_fan, quads, south_fan = _sphere_groups(faces // 2, 1.0)
+    rng = np.random.default_rng(seed)
+    verts = verts * (1 + noise * rng.standard_normal(len(verts)))[:, None]
+    return _buffers(verts, north_fan, quads[:, [0, 1, 2]], quads[:, [0, 2, 3]], south_fan)
+
+corpus = {
+    'cube': subdivided_cube,
+    'sphere': uv_sphere,
+    'scan': noisy_scan,
+}
+
+def make_object(bpy, name, buffers, offset=(0, 0, 0)):
+    """Create a mesh object from buffers through the bpy mesh API"""
+    verts, loop_start, loop_total, loop_verts = buffers
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts))
+    mesh.loops.add(len(loop_verts))
+    mesh.polygons.add(len(loop_start))
+    mesh.vertices.foreach_set("co", verts.astype(np.float32).ravel())
+    mesh.loops.foreach_set("vertex_index", loop_verts)
+    mesh.polygons.foreach_set("loop_start", loop_start)
+    mesh.update(calc_edges=True)
+    obj = bpy.data.objects.new(name, mesh)
+    matrix = np.eye(4)
+    matrix[:3, 3] = offset
+    obj.matrix_world = matrix.tolist()
+    return obj
@@ -0,0 +1,156 @@
+"""Time the OCCUtils stages and command operations outside the UI.
+
+    python benchmarks/run.py --sizes 1000 10000 100000
+    blender --background --python benchmarks/run.py -- --sizes 1000000
+
+Uses the real bpy when it is importable and benchmarks/fake_bpy.py otherwise.
+Results are written as JSON; pass --compare with an earlier file to see ratios."""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+try:
+    import bpy
+except ImportError:
+    import fake_bpy
+    bpy = fake_bpy.install()
+
+import meshes
+
+OPERATIONS = ('boolean_union', 'boolean_intersection', 'boolean_difference', 'rotate_90')
+
+def load_addon():
+    if 'blenderocc' in sys.modules and hasattr(sys.modules['blenderocc'], 'OCCUtils'):
+        return sys.modules['blenderocc']
+    spec = importlib.util.spec_from_file_location('blenderocc', os.path.join(ROOT, 'blenderocc.py'))
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules['blenderocc'] = addon
+    spec.loader.exec_module(addon)
+    return addon
+
+def load_commands(addon):
+    text = bpy.data.texts.get(addon.OCCCommandRegistry.text_name) or bpy.data.texts.new(addon.OCCCommandRegistry.text_name)
+    with open(os.path.join(ROOT, addon.OCCCommandRegistry.text_name)) as f:
+        text.from_string(f.read())
+    return addon.OCCCommandRegistry.load()
+
+def clear_caches(addon):
+    addon.OCCShapeCache.clear()
+    addon.OCCTessellation.clear()
+
+def timed(results, record, func, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        value = func(*args, **kwargs)
+    except Exception as e:
+        results.append(dict(record, seconds=time.perf_counter() - start, error=str(e)))
+        return None
+    results.append(dict(record, seconds=time.perf_counter() - start))
+    return value
+
+def bench_stages(addon, results, kind, obj, sew_limit):
+    utils = addon.OCCUtils
+    faces = len(obj.data.polygons)
+    record = {'mesh': kind, 'faces': faces}
+    buffers = timed(results, dict(record, stage='mesh_buffers'), utils.mesh_buffers, obj)
+    manifold = timed(results, dict(record, stage='manifold_check'), utils.is_closed_manifold, *buffers)
+    shape = None
+    if manifold:
+        shape = timed(results, dict(record, stage='shared_solid'), utils.shared_solid, *buffers)
+    if faces <= sew_limit or shape is None:
+        sewn = timed(results, dict(record, stage='sewn_solid'), utils.sewn_solid, *buffers)
+        shape = shape or sewn
+    if shape is None:
+        return
+    clear_caches(addon)
+    arrays = timed(results, dict(record, stage='tessellate'), utils.shape_to_arrays, shape, True)
+    if arrays is not None:
+        results[-1]['triangles'] = len(arrays[1])
+        mesh = timed(results, dict(record, stage='arrays_to_mesh'), utils.arrays_to_mesh, *arrays)
+        bpy.data.meshes.remove(mesh)
+
+def bench_operations(addon, results, kind, target, tool):
+    for name in OPERATIONS:
+        func = addon.OCCCommandRegistry.get(name)
+        if func is None:
+            continue
+        clear_caches(addon)
+        context = SimpleNamespace(selected_objects=[target, tool], active_object=target, scene=bpy.context.scene)
+        wrapper = addon.OCCWrapper(context=context)
+        record = {'mesh': kind, 'faces': len(target.data.polygons), 'stage': name}
+        if func.transform:
+            trsf = timed(results, record, func, wrapper)
+            if trsf is not None:
+                for bake in (False, True):
+                    obj = timed(results, dict(record, stage=f"{name}.{'bake' if bake else 'matrix'}"),
+                                addon.OCCUtils.transformed_object, target, addon.OCCUtils.trsf_matrix(trsf), name, bake)
+                    if obj is not None:
+                        mesh = obj.data
+                        bpy.data.objects.remove(obj)
+                        bpy.data.meshes.remove(mesh)
+            continue
+        shape = timed(results, record, func, wrapper)
+        if shape is not None:
+            mesh = timed(results, dict(record, stage=f"{name}.tessellate"), wrapper.create_mesh, shape)
+            if mesh is not None:
+                bpy.data.meshes.remove(mesh)
+
+def compare(results, path):
+    with open(path) as f:
+        previous = {(r['mesh'], r['faces'], r['stage']): r['seconds'] for r in json.load(f)['results'] if 'error' not in r}
+    print(f"{'mesh':>8} {'faces':>9} {'stage':<32} {'before':>9} {'after':>9} {'ratio':>7}")
+    for r in results:
+        before = previous.get((r['mesh'], r['faces'], r['stage']))
+        if before and 'error' not in r:
+            print(f"{r['mesh']:>8} {r['faces']:>9} {r['stage']:<32} {before:>9.3f} {r['seconds']:>9.3f} {r['seconds'] / before:>7.2f}")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--meshes', nargs='+', default=list(meshes.corpus), choices=list(meshes.corpus))
+    parser.add_argument('--sew-limit', type=int, default=50000, help="skip the sewing path above this face count")
+    parser.add_argument('--no-operations', action='store_true', help="only time the OCCUtils stages")
+    parser.add_argument('--output', default=os.path.join(HERE, 'results', f"bench-{datetime.now():%Y%m%d_%H%M%S}.json"))
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    addon = load_addon()
+    load_commands(addon)
+    results = []
+    for kind in args.meshes:
+        for size in args.sizes:
+            buffers = meshes.corpus[kind](size)
+            target = meshes.make_object(bpy, f"{kind}_{size}", buffers)
+            bench_stages(addon, results, kind, target, args.sew_limit)
+            if not args.no_operations:
+                tool = meshes.make_object(bpy, f"{kind}_{size}_tool", buffers, offset=(0.5, 0.3, 0.2))
+                bench_operations(addon, results, kind, target, tool)
+            for r in results:
+                if r['mesh'] == kind and r['faces'] == len(target.data.polygons):
+                    print(f"{kind:>8} {r['faces']:>9} {r['stage']:<32} {r['seconds']:>9.3f} {r.get('error', '')}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'started': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'blender': getattr(getattr(bpy, 'app', None), 'version_string', None),
+            'module_imports': addon.OCCModules.timings,
+            'results': results,
+        }, f, indent=1)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:])
@@ -10,32 +10,712 @@ bl_info = {
 import bpy
 import numpy as np
 import os
+import hashlib
+import importlib
+import importlib.util
+import ast
+import threading
+import time
+import cProfile
+import io
+import json
+import re
+import urllib.request
+import pstats
+import tracemalloc
+import base64
+import tempfile
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from bpy_extras.io_utils import ExportHelper, ImportHelper
 from functools import wraps
 
-def occ_operation(name):
+def occ_operation(name, background=False, transform=False):
+    """background marks operations that only touch the wrapper (self.context,
+    get_shape, get_module) and can therefore run on a worker thread.
+    transform marks operations returning a gp_Trsf (or 4x4 array) that is applied
+    to the active object without going through a BRep."""
     def decorator(func):
         @wraps(func)
         def wrapper(wrapper_instance, *args, **kwargs):
             return func(wrapper_instance, *args, **kwargs)
         wrapper.is_occ_op = True
         wrapper.op_name = name
+        wrapper.background = background
+        wrapper.transform = transform
         return wrapper
     return decorator
 
+class OCCCancelled(Exception):
+    pass
+
+class OCCMeshError(Exception):
+    """Mesh that cannot become a closed solid, raised before any OCC object exists"""
+    pass
+
+class OCCTrace:
+    """Wall time, counts and peak Python memory per stage of an OCC operation.
+    Spans nest per thread; the outermost span of each operation is kept in operations.
+    Memory comes from tracemalloc, so it covers NumPy buffers but not OCC's own heap."""
+    enabled = True
+    memory = False
+    profile = False
+    max_operations = 20
+    operations = []
+    _local = threading.local()
+
+    @classmethod
+    @contextmanager
+    def span(cls, name, **counts):
+        if not cls.enabled:
+            yield counts
+            return
+        parent = getattr(cls._local, 'current', None)
+        record = {'name': name, 'counts': counts, 'children': [], 'thread': threading.get_ident(),
+                  'start': time.perf_counter(), 'peak_bytes': 0}
+        profiler = None
+        if parent is None:
+            record['memory'] = cls.memory and not tracemalloc.is_tracing()
+            if record['memory']:
+                tracemalloc.start()
+            if cls.profile:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        else:
+            parent['children'].append(record)
+            cls.fold_peak(parent)
+        cls._local.current = record
+        try:
+            yield counts
+        finally:
+            record['seconds'] = time.perf_counter() - record['start']
+            cls.fold_peak(record)
+            cls._local.current = parent
+            if parent is not None:
+                parent['peak_bytes'] = max(parent['peak_bytes'], record['peak_bytes'])
+            else:
+                if record.pop('memory'):
+                    tracemalloc.stop()
+                if profiler:
+                    profiler.disable()
+                    out = io.StringIO()
+                    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+                    record['profile'] = out.getvalue()
+                cls.operations.append(record)
+                del cls.operations[:-cls.max_operations]
+
+    @staticmethod
+    def fold_peak(record):
+        if tracemalloc.is_tracing():
+            record['peak_bytes'] = max(record['peak_bytes'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+    @classmethod
+    def walk(cls, record, depth=0):
+        yield depth, record
+        for child in record['children']:
+            yield from cls.walk(child, depth + 1)
+
+    @classmethod
+    def chrome_events(cls):
+        """Operations as Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        events = []
+        for operation in cls.operations:
+            for _, record in cls.walk(operation):
+                events.append({
+                    'name': record['name'], 'ph': 'X', 'pid': os.getpid(), 'tid': record['thread'],
+                    'ts': record['start'] * 1e6, 'dur': record.get('seconds', 0) * 1e6,
+                    'args': dict(record['counts'], peak_bytes=record['peak_bytes']),
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    @staticmethod
+    def publish_profile(record):
+        """Show a captured profile in a text datablock; main thread only"""
+        if 'profile' in record:
+            text = bpy.data.texts.get("occ_profile.txt") or bpy.data.texts.new("occ_profile.txt")
+            text.from_string(f"# {record['name']}\n{record['profile']}")
+
+class OCCModules:
+    """Process-wide registry of OCC.Core modules, imported lazily and shared by every wrapper"""
+    common = ('gp', 'TopAbs', 'TopoDS', 'TopLoc', 'TopExp', 'BRep', 'BRepBuilderAPI',
+              'BRepLib', 'BRepMesh', 'BRepAlgoAPI', 'BRepPrimAPI')
+    warm_up_on_register = True
+    modules = {}
+    timings = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name):
+        module = cls.modules.get(name)
+        if module is None:
+            with cls._lock:
+                if name not in cls.modules:
+                    start = time.perf_counter()
+                    try:
+                        cls.modules[name] = importlib.import_module(f"OCC.Core.{name}")
+                    except ImportError as e:
+                        raise ImportError(f"Failed to import {name}: {e}")
+                    cls.timings[name] = time.perf_counter() - start
+                module = cls.modules[name]
+        return module
+
+    @classmethod
+    def warm_up(cls, names=None):
+        """Import modules on a background thread so the first button press doesn't pay for it"""
+        def load():
+            for name in names or cls.common:
+                try:
+                    cls.get(name)
+                except ImportError as e:
+                    print(f"OCC warm-up: {e}")
+        thread = threading.Thread(target=load, name="occ-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+class OCCShapeCache:
+    """Converted solids keyed on the local mesh buffers, evicted LRU by estimated size.
+    Rigid object transforms are applied as a TopLoc_Location, so moving an object
+    reuses its shape instead of reconverting it."""
+    max_bytes = 512 * 2**20
+    bytes_per_face = 2048
+    disk_dir = os.environ.get('BLENDEROCC_SHAPE_CACHE')
+    stats = {'hits': 0, 'disk': 0, 'misses': 0, 'moved': 0, 'payload': 0}
+    _shapes = OrderedDict()
+    _bytes = 0
+    _lock = threading.RLock()
+
+    @staticmethod
+    def key(*arrays):
+        digest = hashlib.blake2b(digest_size=16)
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_rigid(matrix, tol=1e-6):
+        rotation = matrix[:3, :3]
+        return (np.allclose(rotation.T @ rotation, np.eye(3), atol=tol) and np.linalg.det(rotation) > 0
+                and np.allclose(matrix[3], (0, 0, 0, 1)))
+
+    @staticmethod
+    def location(matrix):
+        # matrix_world is float32, so its rotation is only orthonormal to ~1e-8, which
+        # SetValues would keep as a scale factor that Moved rejects; snap it to the
+        # nearest rotation in float64 and build the transform with an exact unit scale
+        matrix = np.asarray(matrix, dtype=np.float64)
+        u, _, vt = np.linalg.svd(matrix[:3, :3])
+        gp = OCCModules.get('gp')
+        trsf = gp.gp_Trsf()
+        trsf.SetRotation(gp.gp_Quaternion(gp.gp_Mat(*(u @ vt).ravel())))
+        trsf.SetTranslationPart(gp.gp_Vec(*matrix[:3, 3]))
+        return OCCModules.get('TopLoc').TopLoc_Location(trsf)
+
+    @classmethod
+    def get(cls, obj):
+        with OCCTrace.span(f"get_shape {obj.name}") as counts:
+            shape = cls.get_untraced(obj, counts)
+        return shape
+
+    @classmethod
+    def get_untraced(cls, obj, counts):
+        if isinstance(obj, OCCMeshSnapshot):
+            verts, loop_start, loop_total, loop_verts = obj.buffers
+        else:
+            verts, loop_start, loop_total, loop_verts = OCCUtils.mesh_buffers(obj, world=False)
+        matrix = np.array(obj.matrix_world)
+        key = cls.key(verts, loop_start, loop_total, loop_verts)
+        counts['faces'] = len(loop_start)
+        rigid = cls.is_rigid(matrix)
+        if not rigid:
+            key = f"{key}-{cls.key(matrix)}"
+            verts = OCCUtils.transform_points(verts, matrix)
+        shape = cls.lookup(key)
+        counts['cached'] = shape is not None
+        # the saved BRep is only decoded on a miss
+        source = None
+        if shape is None and rigid:
+            source = obj.payload if isinstance(obj, OCCMeshSnapshot) else OCCShapePayload.source(obj.data)
+        if source and source[0] == key:
+            # exact BRep saved with this mesh, which hasn't been edited since
+            shape = OCCShapePayload.shape(OCCShapePayload.data(source))
+            counts['payload'] = True
+            cls.stats['payload'] += 1
+            cls.remember(key, shape, len(loop_start) * cls.bytes_per_face)
+        if shape is None:
+            shape = OCCUtils.buffers_to_solid(verts, loop_start, loop_total, loop_verts, name=obj.name)
+            cls.store(key, shape, len(loop_start))
+        if rigid and not np.allclose(matrix, np.eye(4)):
+            cls.stats['moved'] += 1
+            shape = shape.Moved(cls.location(matrix))
+        return shape
+
+    @classmethod
+    def cached(cls, key):
+        with cls._lock:
+            return key in cls._shapes
+
+    @classmethod
+    def lookup(cls, key):
+        with cls._lock:
+            if key in cls._shapes:
+                cls._shapes.move_to_end(key)
+                cls.stats['hits'] += 1
+                return cls._shapes[key][0]
+        path = cls.disk_path(key)
+        if path and os.path.exists(path):
+            shape = OCCModules.get('TopoDS').TopoDS_Shape()
+            if OCCModules.get('BinTools').bintools.Read(shape, path):
+                cls.stats['disk'] += 1
+                cls.remember(key, shape, os.path.getsize(path))
+                return shape
+        cls.stats['misses'] += 1
+        return None
+
+    @classmethod
+    def store(cls, key, shape, faces):
+        cls.remember(key, shape, faces * cls.bytes_per_face)
+        path = cls.disk_path(key)
+        if path:
+            os.makedirs(cls.disk_dir, exist_ok=True)
+            OCCModules.get('BinTools').bintools.Write(shape, path)
+
+    @classmethod
+    def alias(cls, source, mesh, matrix):
+        """Register mesh, whose local vertices are source's moved by matrix,
+        as source's cached shape under that location. No geometry is copied."""
+        if not cls.is_rigid(matrix):
+            return
+        with cls._lock:
+            entry = cls._shapes.get(cls.key(*OCCUtils.mesh_buffers(source, world=False)))
+        if entry:
+            moved = entry[0].Moved(cls.location(matrix))
+            cls.remember(cls.key(*OCCUtils.mesh_arrays(mesh)), moved, entry[1])
+
+    @classmethod
+    def remember(cls, key, shape, size):
+        with cls._lock:
+            if key in cls._shapes:
+                cls._bytes -= cls._shapes.pop(key)[1]
+            cls._shapes[key] = (shape, size)
+            cls._bytes += size
+            while cls._bytes > cls.max_bytes and len(cls._shapes) > 1:
+                cls._bytes -= cls._shapes.popitem(last=False)[1][1]
+
+    @classmethod
+    def disk_path(cls, key):
+        """Disk files outlive the in-memory tier, so they are also keyed on Repair Shapes"""
+        if not cls.disk_dir:
+            return None
+        suffix = "-fix" if OCCMeshValidator.shape_fix else ""
+        return os.path.join(cls.disk_dir, f"{key}{suffix}.brep")
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._shapes.clear()
+            cls._bytes = 0
+
+class OCCShapePayload:
+    """Exact BRep of a result mesh, compressed BinTools data kept as custom properties
+    on the mesh datablock so it is saved in the .blend. With BLENDEROCC_BREP_DIR set the
+    data goes to a sidecar file named by a per-mesh id instead. The mesh fingerprint
+    is stored alongside, so an edited mesh falls back to mesh conversion."""
+    sidecar_dir = os.environ.get('BLENDEROCC_BREP_DIR')
+    _shapes = {}
+
+    @staticmethod
+    def serialize(shape):
+        handle, path = tempfile.mkstemp(suffix=".brep")
+        os.close(handle)
+        try:
+            BinTools = OCCModules.get('BinTools')
+            # geometry only: the mesh already is the triangulation
+            BinTools.bintools.Write(shape, path, False, False, BinTools.BinTools_FormatVersion_CURRENT)
+            with open(path, 'rb') as f:
+                return zlib.compress(f.read())
+        finally:
+            os.remove(path)
+
+    @classmethod
+    def shape(cls, data):
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if digest not in cls._shapes:
+            handle, path = tempfile.mkstemp(suffix=".brep")
+            try:
+                with os.fdopen(handle, 'wb') as f:
+                    f.write(zlib.decompress(data))
+                shape = OCCModules.get('TopoDS').TopoDS_Shape()
+                OCCModules.get('BinTools').bintools.Read(shape, path)
+            finally:
+                os.remove(path)
+            cls._shapes = {digest: shape}
+        return cls._shapes[digest]
+
+    @classmethod
+    def store(cls, mesh, shape):
+        data = cls.serialize(shape)
+        mesh["occ_brep_mesh"] = OCCShapeCache.key(*OCCUtils.mesh_arrays(mesh))
+        OCCShapeCache.remember(mesh["occ_brep_mesh"], shape, len(mesh.polygons) * OCCShapeCache.bytes_per_face)
+        if cls.sidecar_dir:
+            mesh["occ_brep_id"] = mesh.get("occ_brep_id") or uuid.uuid4().hex
+            os.makedirs(cls.sidecar_dir, exist_ok=True)
+            with open(os.path.join(cls.sidecar_dir, f"{mesh['occ_brep_id']}.brepz"), 'wb') as f:
+                f.write(data)
+            if "occ_brep" in mesh:
+                del mesh["occ_brep"]
+        else:
+            mesh["occ_brep"] = base64.b64encode(data).decode('ascii')
+
+    @classmethod
+    def source(cls, mesh):
+        """(mesh fingerprint at store time, 'text' or 'file', base64 text or sidecar path)
+        or None, without decoding anything; main thread only"""
+        fingerprint = mesh.get("occ_brep_mesh")
+        if not fingerprint:
+            return None
+        if "occ_brep" in mesh:
+            return fingerprint, 'text', mesh["occ_brep"]
+        if cls.sidecar_dir and mesh.get("occ_brep_id"):
+            path = os.path.join(cls.sidecar_dir, f"{mesh['occ_brep_id']}.brepz")
+            if os.path.exists(path):
+                return fingerprint, 'file', path
+        return None
+
+    @staticmethod
+    def data(source):
+        """Compressed BRep of a source; safe off the main thread"""
+        _, kind, value = source
+        if kind == 'file':
+            with open(value, 'rb') as f:
+                return f.read()
+        return base64.b64decode(value)
+
+    @classmethod
+    def read(cls, mesh):
+        """(mesh fingerprint at store time, compressed BRep) or None; main thread only"""
+        source = cls.source(mesh)
+        return (source[0], cls.data(source)) if source else None
+
+class OCCMeshSnapshot:
+    """Main-thread copy of everything the OCC side reads from a mesh object"""
+    type = 'MESH'
+
+    def __init__(self, obj):
+        self.name = obj.name
+        self.matrix_world = np.array(obj.matrix_world)
+        self.buffers = OCCUtils.mesh_buffers(obj, world=False)
+        # skipped when the shape is in memory already: the payload is only for misses
+        fingerprint = obj.data.get("occ_brep_mesh")
+        self.payload = None if OCCShapeCache.cached(fingerprint) else OCCShapePayload.source(obj.data)
+
+class OCCContextSnapshot:
+    """Stand-in for bpy.context handed to operations running off the main thread"""
+    def __init__(self, context):
+        snapshots = {obj.name: OCCMeshSnapshot(obj) for obj in context.selected_objects if obj.type == 'MESH'}
+        active = context.active_object
+        if active and active.type == 'MESH' and active.name not in snapshots:
+            snapshots[active.name] = OCCMeshSnapshot(active)
+        self.selected_objects = [snapshots[obj.name] for obj in context.selected_objects if obj.name in snapshots]
+        self.active_object = snapshots.get(active.name) if active else None
+
+class OCCTessellation:
+    """Meshing with deflection relative to the shape's bounding box, run in parallel.
+    Arrays are cached per shape and level of detail, so switching back to a level is
+    free, and BRepMesh only re-meshes faces whose triangulation is coarser than asked.
+    A coarser level requested after a finer one reuses the finer triangulation.
+    The cached arrays and the source shapes kept for Retessellate (which hold their
+    triangulation) each stay under max_bytes, least recently used first out."""
+    # linear deflection as a fraction of the bounding box diagonal, angular deflection in radians
+    levels = {'coarse': (0.01, 0.8), 'medium': (0.002, 0.5), 'fine': (0.0005, 0.2)}
+    max_bytes = 256 * 2**20
+    _arrays = OrderedDict()
+    _bytes = 0
+    _lock = threading.RLock()
+    sources = OrderedDict()
+    _source_sizes = {}
+    _source_bytes = 0
+
+    @staticmethod
+    def parameters(shape, level):
+        box = OCCModules.get('Bnd').Bnd_Box()
+        OCCModules.get('BRepBndLib').brepbndlib.Add(shape, box)
+        if box.IsVoid():
+            return OCCTessellation.levels[level]
+        xmin, ymin, zmin, xmax, ymax, zmax = box.Get()
+        diagonal = np.linalg.norm((xmax - xmin, ymax - ymin, zmax - zmin))
+        linear, angular = OCCTessellation.levels[level]
+        return max(diagonal * linear, 1e-6), angular
+
+    @classmethod
+    def arrays(cls, shape, level='medium', weld=False, tol=1e-6):
+        key = (shape, level, weld)
+        with cls._lock:
+            if key in cls._arrays:
+                cls._arrays.move_to_end(key)
+                return cls._arrays[key][0]
+        linear, angular = cls.parameters(shape, level)
+        with OCCTrace.span("brepmesh", level=level, deflection=linear):
+            OCCModules.get('BRepMesh').BRepMesh_IncrementalMesh(shape, linear, False, angular, True)
+        with OCCTrace.span("triangles") as counts:
+            result = OCCUtils.triangulation_arrays(shape, weld, tol)
+            counts.update(vertices=len(result[0]), triangles=len(result[1]))
+        with cls._lock:
+            if key in cls._arrays:
+                cls._bytes -= cls._arrays.pop(key)[1]
+            size = result[0].nbytes + result[1].nbytes
+            cls._arrays[key] = (result, size)
+            cls._bytes += size
+            while cls._bytes > cls.max_bytes and len(cls._arrays) > 1:
+                cls._bytes -= cls._arrays.popitem(last=False)[1][1]
+        return result
+
+    @classmethod
+    def add_source(cls, mesh, shape):
+        """Remember the shape mesh was tessellated from, sized like the mesh arrays"""
+        with cls._lock:
+            cls.discard_source(mesh.name)
+            size = len(mesh.vertices) * 24 + len(mesh.polygons) * 12
+            cls.sources[mesh.name] = shape
+            cls._source_sizes[mesh.name] = size
+            cls._source_bytes += size
+            while cls._source_bytes > cls.max_bytes and len(cls.sources) > 1:
+                name, _ = cls.sources.popitem(last=False)
+                cls._source_bytes -= cls._source_sizes.pop(name)
+
+    @classmethod
+    def discard_source(cls, name):
+        with cls._lock:
+            if cls.sources.pop(name, None) is not None:
+                cls._source_bytes -= cls._source_sizes.pop(name)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._arrays.clear()
+            cls._bytes = 0
+
+class OCCSpatialIndex:
+    """World-space bounding boxes of mesh objects, queried before any BRep is built"""
+    def __init__(self, objects, margin=0.0):
+        self.objects = list(objects)
+        self.boxes = np.array([self.bounds(obj) for obj in self.objects], dtype=np.float64).reshape(-1, 2, 3)
+        self.boxes[:, 0] -= margin
+        self.boxes[:, 1] += margin
+
+    @staticmethod
+    def bounds(obj):
+        if isinstance(obj, OCCMeshSnapshot):
+            corners = obj.buffers[0]
+        else:
+            corners = np.array([tuple(corner) for corner in obj.bound_box], dtype=np.float64)
+        if not len(corners):
+            return np.full(3, np.inf), np.full(3, -np.inf)
+        corners = OCCUtils.transform_points(corners, np.array(obj.matrix_world))
+        return corners.min(axis=0), corners.max(axis=0)
+
+    def overlapping(self, obj):
+        """Objects whose box touches the box of obj"""
+        i = self.objects.index(obj)
+        box = self.boxes[i]
+        hit = np.all((self.boxes[:, 0] <= box[1]) & (self.boxes[:, 1] >= box[0]), axis=1)
+        hit[i] = False
+        return [self.objects[j] for j in np.flatnonzero(hit)]
+
+    def pairs(self):
+        """Overlapping index pairs by sweep and prune along x"""
+        order = np.argsort(self.boxes[:, 0, 0])
+        starts = self.boxes[order, 0, 0]
+        result = []
+        for i, a in enumerate(order):
+            end = np.searchsorted(starts, self.boxes[a, 1, 0], side='right')
+            for b in order[i + 1:end]:
+                if np.all(self.boxes[a, 0] <= self.boxes[b, 1]) and np.all(self.boxes[b, 0] <= self.boxes[a, 1]):
+                    result.append((int(a), int(b)))
+        return result
+
+    def isolated(self):
+        """Objects that overlap no other object"""
+        touched = {i for pair in self.pairs() for i in pair}
+        return [obj for i, obj in enumerate(self.objects) if i not in touched]
+
+class OCCCADReader:
+    """STEP or IGES file transferred into an XCAF document. instances() walks the
+    assembly tree and yields every placed part, so each distinct part can be
+    tessellated once and shared by all of its instances."""
+    def __init__(self, path):
+        oc = OCCUtils.import_occ('TDocStd', 'XCAFDoc', 'STEPCAFControl', 'IGESCAFControl', 'IFSelect')
+        self.doc = oc['TDocStd'].TDocStd_Document("blenderocc")
+        self.shape_tool = oc['XCAFDoc'].XCAFDoc_DocumentTool.ShapeTool(self.doc.Main())
+        if path.lower().endswith(('.igs', '.iges')):
+            reader = oc['IGESCAFControl'].IGESCAFControl_Reader()
+        else:
+            reader = oc['STEPCAFControl'].STEPCAFControl_Reader()
+        reader.SetNameMode(True)
+        if reader.ReadFile(path) != oc['IFSelect'].IFSelect_RetDone:
+            raise IOError(f"Could not read {path}")
+        if not reader.Transfer(self.doc):
+            raise IOError(f"Could not transfer {path}")
+
+    @staticmethod
+    def entry(label):
+        entry = OCCModules.get('TCollection').TCollection_AsciiString()
+        OCCModules.get('TDF').TDF_Tool.Entry(label, entry)
+        return entry.ToCString()
+
+    @staticmethod
+    def name(label):
+        name = label.GetLabelName() if hasattr(label, 'GetLabelName') else ""
+        return name or f"Part_{label.Tag()}"
+
+    def instances(self):
+        """(part key, part name, unlocated part shape, TopLoc_Location) per placed instance"""
+        TDF = OCCModules.get('TDF')
+        labels = TDF.TDF_LabelSequence()
+        self.shape_tool.GetFreeShapes(labels)
+        stack = [(labels.Value(i), OCCModules.get('TopLoc').TopLoc_Location()) for i in range(labels.Length(), 0, -1)]
+        while stack:
+            label, location = stack.pop()
+            if self.shape_tool.IsReference(label):
+                referred = TDF.TDF_Label()
+                self.shape_tool.GetReferredShape(label, referred)
+                stack.append((referred, location.Multiplied(self.shape_tool.GetLocation(label))))
+            elif self.shape_tool.IsAssembly(label):
+                components = TDF.TDF_LabelSequence()
+                self.shape_tool.GetComponents(label, components)
+                stack.extend((components.Value(i), location) for i in range(components.Length(), 0, -1))
+            else:
+                shape = self.shape_tool.GetShape(label)
+                located = location.Multiplied(shape.Location())
+                yield self.entry(label), self.name(label), shape.Located(OCCModules.get('TopLoc').TopLoc_Location()), located
+
+    @staticmethod
+    def matrix(location, scale=1.0):
+        trsf = location.Transformation()
+        rows = [[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)]
+        for row in rows:
+            row[3] *= scale
+        return rows + [[0.0, 0.0, 0.0, 1.0]]
+
+class OCCSVGExporter:
+    """Mesh buffers to SVG with the projection, shading and painter's depth order done
+    as NumPy array ops. Output is written to a stream in chunks."""
+    chunk_faces = 5000
+    clipboard_faces = 2000
+
+    def __init__(self, view=(1, -1, 1), light=(0.3, -0.5, 1), cull=True, merge=True, precision=5):
+        self.view = np.asarray(view, dtype=np.float64) / np.linalg.norm(view)
+        self.light = np.asarray(light, dtype=np.float64) / np.linalg.norm(light)
+        right = np.cross((0, 0, 1), self.view)
+        if np.linalg.norm(right) < 1e-9:
+            right = np.array((1.0, 0.0, 0.0))
+        self.right = right / np.linalg.norm(right)
+        self.up = np.cross(self.view, self.right)
+        self.cull = cull
+        self.merge = merge
+        self.precision = precision
+
+    def faces(self, verts, loop_start, loop_total, loop_verts):
+        """Screen points, kept face indices grouped back to front, and a gray level per group"""
+        screen = np.stack([verts @ self.right, -(verts @ self.up)], axis=1)
+        if not len(loop_start):
+            return screen, [], np.zeros(0, np.int32)
+        a, b = OCCUtils.loop_edges(loop_start, loop_total, loop_verts)
+        normals = np.add.reduceat(np.cross(verts[a], verts[b]), loop_start)
+        lengths = np.maximum(np.linalg.norm(normals, axis=1), 1e-30)
+        normals /= lengths[:, None]
+        depth = np.add.reduceat((verts @ self.view)[loop_verts], loop_start) / loop_total
+        keep = lengths > 1e-30
+        if self.cull:
+            keep &= normals @ self.view > 0
+        kept = np.flatnonzero(keep)
+        shade = np.round(255 * (0.3 + 0.7 * np.clip(normals[kept] @ self.light, 0, 1))).astype(np.int32)
+        if self.merge:
+            # edge-connected coplanar faces of equal shade become one path of several subpaths;
+            # far apart coplanar faces stay separate so each keeps its own depth
+            offsets = np.add.reduceat((verts[loop_verts] * np.repeat(normals, loop_total, axis=0)).sum(axis=1), loop_start) / loop_total
+            scale = max(np.ptp(verts, axis=0).max(), 1e-9)
+            keys = np.c_[np.round(normals[kept] * 1e4), np.round(offsets[kept] / scale * 1e5), shade].astype(np.int64)
+            plane = np.full(len(loop_start), -1)
+            plane[kept] = np.unique(keys, axis=0, return_inverse=True)[1].reshape(-1)
+            face = np.repeat(np.arange(len(loop_start)), loop_total)
+            edges = np.minimum(a, b).astype(np.int64) * len(verts) + np.maximum(a, b)
+            edge_order = np.argsort(edges, kind='stable')
+            shared = np.flatnonzero(edges[edge_order[1:]] == edges[edge_order[:-1]])
+            first, second = face[edge_order[shared]], face[edge_order[shared + 1]]
+            joined = (plane[first] == plane[second]) & (plane[first] >= 0)
+            labels = OCCUtils.components(len(loop_start), first[joined], second[joined])
+            groups = np.unique(labels[kept], return_inverse=True)[1].reshape(-1)
+        else:
+            groups = np.arange(len(kept))
+        count = groups.max() + 1 if len(groups) else 0
+        group_depth = np.bincount(groups, weights=depth[kept], minlength=count) / np.maximum(np.bincount(groups, minlength=count), 1)
+        order = np.argsort(group_depth[groups], kind='stable')
+        kept, groups, shade = kept[order], groups[order], shade[order]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]) if len(groups) else np.zeros(0, dtype=np.int64)
+        return screen, np.split(kept, starts[1:]), shade[starts]
+
+    def write(self, stream, verts, loop_start, loop_total, loop_verts):
+        """Write the drawing to stream, returning the number of faces drawn"""
+        screen, groups, shades = self.faces(verts, loop_start, loop_total, loop_verts)
+        lo, hi = (screen.min(axis=0), screen.max(axis=0)) if len(screen) else (np.zeros(2), np.ones(2))
+        margin = (hi - lo).max() * 0.1
+        stream.write(f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{lo[0]-margin:.{self.precision}g} {lo[1]-margin:.{self.precision}g} '
+                     f'{hi[0]-lo[0]+2*margin:.{self.precision}g} {hi[1]-lo[1]+2*margin:.{self.precision}g}">\n')
+        points = [f"{x:.{self.precision}g},{y:.{self.precision}g}" for x, y in screen.tolist()]
+        loop_verts, loop_start, loop_total = loop_verts.tolist(), loop_start.tolist(), loop_total.tolist()
+        chunk, drawn = [], 0
+        for group, gray in zip(groups, shades.tolist()):
+            subpaths = []
+            for face in group.tolist():
+                start = loop_start[face]
+                subpaths.append("M " + " L ".join(points[i] for i in loop_verts[start:start + loop_total[face]]) + " Z")
+            chunk.append(f'<path d="{" ".join(subpaths)}" fill="#{gray:02x}{gray:02x}{gray:02x}" stroke="none"/>\n')
+            drawn += len(subpaths)
+            if len(chunk) >= self.chunk_faces:
+                stream.write("".join(chunk))
+                chunk.clear()
+        stream.write("".join(chunk))
+        stream.write('</svg>\n')
+        return drawn
+
 class OCCWrapper:
-    def __init__(self):
-        self.oc = {}
-        
+    def __init__(self, context=None, job=None):
+        self.oc = OCCModules.modules
+        self.context = context or bpy.context
+        self.job = job
+        self.messages = []
+
     def get_module(self, name):
-        if name not in self.oc:
-            self.oc[name] = OCCUtils.import_occ(name)[name]
-        return self.oc[name]
-        
+        return OCCModules.get(name)
+
+    def report(self, level, message):
+        self.messages.append((level, message))
+
+    def progress(self, stage, fraction=None):
+        """Publish the current stage; raises OCCCancelled once the job is cancelled"""
+        if self.job:
+            self.job.update(stage, fraction)
+
     def get_shape(self, obj):
-        return OCCUtils.create_solid(obj)
+        self.progress(f"Converting {obj.name}")
+        return OCCShapeCache.get(obj)
         
-    def create_mesh(self, shape, name="OCCResult"):
-        return OCCUtils.shape_to_mesh(shape, name)
+    def make_compound(self, shapes):
+        builder = self.get_module('BRep').BRep_Builder()
+        compound = self.get_module('TopoDS').TopoDS_Compound()
+        builder.MakeCompound(compound)
+        for shape in shapes:
+            builder.Add(compound, shape)
+        return compound
+
+    def create_mesh(self, shape, name="OCCResult", weld=True, level='medium'):
+        mesh = OCCUtils.shape_to_mesh(shape, name, weld, level=level)
+        OCCShapePayload.store(mesh, shape)
+        return mesh
         
     def create_object(self, method, args=None, kwargs=None, name=None):
         args = args or []
@@ -54,86 +734,475 @@ class OCCWrapper:
     def switch_to_text(text_name='custom_commands.py'):
         return OCCUtils.switch_to_text(text_name)
 
+class OCCMeshValidator:
+    """Watertightness checks and repairs on the index buffers, before conversion.
+    Closed manifold input passes through untouched; otherwise near-duplicate vertices
+    are welded on a spatial hash and inconsistent winding is flipped, and whatever is
+    still open or non-manifold raises OCCMeshError naming the offending edges, as do
+    faces with no area and meshes with no faces at all. Both tolerances are relative
+    to the bounding box diagonal.
+    shape_fix runs ShapeFix_Shape over the built solid as an optional last repair."""
+    weld_tolerance = 1e-5
+    area_tolerance = 1e-6
+    shape_fix = False
+    samples = 5
+
+    @staticmethod
+    def cell_keys(cells):
+        # spatial hash; colliding cells only add candidates that the distance test rejects
+        return (cells[:, 0] * 73856093) ^ (cells[:, 1] * 19349663) ^ (cells[:, 2] * 83492791)
+
+    @classmethod
+    def weld_map(cls, verts, tol):
+        """Index of the vertex each vertex merges into. Pairs closer than tol are looked
+        for in each occupied cell of a tol-sized grid and its 26 neighbours (13 offsets
+        cover each neighbouring pair once), then joined union-find style"""
+        cells = np.floor(verts / tol).astype(np.int64)
+        keys, first, inverse, counts = np.unique(cls.cell_keys(cells), return_index=True,
+                                                 return_inverse=True, return_counts=True)
+        members = np.argsort(inverse.ravel(), kind='stable')
+        starts = np.cumsum(counts) - counts
+        occupied = np.arange(len(keys))
+        cell_pairs = [(occupied[counts > 1], occupied[counts > 1])]
+        for offset in np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1])).reshape(3, -1).T[14:]:
+            neighbours = cls.cell_keys(cells[first] + offset)
+            found = np.minimum(np.searchsorted(keys, neighbours), len(keys) - 1)
+            hit = keys[found] == neighbours
+            cell_pairs.append((occupied[hit], found[hit]))
+        first_points, second_points = [], []
+        for a, b in cell_pairs:
+            # every point of cell a against every point of cell b
+            sizes = counts[a] * counts[b]
+            pair = np.repeat(np.arange(len(a)), sizes)
+            local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            i = members[starts[a][pair] + local // counts[b][pair]]
+            j = members[starts[b][pair] + local % counts[b][pair]]
+            close = (i != j) & (np.linalg.norm(verts[i] - verts[j], axis=1) <= tol)
+            first_points.append(i[close])
+            second_points.append(j[close])
+        return OCCUtils.components(len(verts), np.concatenate(first_points), np.concatenate(second_points))
+
+    @classmethod
+    def weld(cls, verts, loop_start, loop_total, loop_verts, tol):
+        """Merge vertices closer than tol, then drop the edges and polygons that collapse"""
+        remap = cls.weld_map(verts, tol)
+        loop_verts = remap[loop_verts].astype(np.int32)
+        polygon = np.repeat(np.arange(len(loop_start)), loop_total)
+        a, b = OCCUtils.loop_edges(loop_start, loop_total, loop_verts)
+        keep = a != b
+        loop_verts, polygon = loop_verts[keep], polygon[keep]
+        totals = np.bincount(polygon, minlength=len(loop_start))
+        keep = (totals >= 3)[polygon]
+        loop_total = totals[totals >= 3].astype(np.int32)
+        loop_start = (np.cumsum(loop_total) - loop_total).astype(np.int32)
+        return loop_start, loop_total, loop_verts[keep]
+
+    @staticmethod
+    def edges(verts, loop_start, loop_total, loop_verts):
+        """Half-edge order sorted by undirected edge, from and to vertices, polygon and
+        the number of half-edges on the same edge, per half-edge"""
+        a, b = OCCUtils.loop_edges(loop_start, loop_total, loop_verts)
+        a, b = a.astype(np.int64), b.astype(np.int64)
+        keys = np.minimum(a, b) * len(verts) + np.maximum(a, b)
+        order = np.argsort(keys, kind='stable')
+        ordered = keys[order]
+        runs = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1], True])
+        counts = np.empty(len(keys), dtype=np.int64)
+        counts[order] = np.repeat(np.diff(runs), np.diff(runs))
+        polygon = np.repeat(np.arange(len(loop_start)), loop_total)
+        return order, a, b, polygon, counts
+
+    @classmethod
+    def describe(cls, verts, a, b, mask, what):
+        pairs = np.unique(np.c_[np.minimum(a[mask], b[mask]), np.maximum(a[mask], b[mask])], axis=0)
+        shown = ", ".join(f"{i}-{j} at ({', '.join(f'{c:.4g}' for c in verts[i])})" for i, j in pairs[:cls.samples])
+        more = f" and {len(pairs) - cls.samples} more" if len(pairs) > cls.samples else ""
+        return f"{len(pairs)} {what} edges: {shown}{more}"
+
+    @staticmethod
+    def orient(a, b, polygon, order, counts, faces):
+        """Flip flags making every manifold edge run opposite ways in its two faces,
+        found breadth first from one face per connected piece"""
+        pairs = order[counts[order] == 2].reshape(-1, 2)
+        first, second = polygon[pairs[:, 0]], polygon[pairs[:, 1]]
+        parity = a[pairs[:, 0]] == a[pairs[:, 1]]
+        if not parity.any():
+            return np.zeros(faces, dtype=bool)
+        source = np.r_[first, second]
+        target = np.r_[second, first]
+        flips = np.r_[parity, parity]
+        by_source = np.argsort(source, kind='stable')
+        target, flips = target[by_source].tolist(), flips[by_source].tolist()
+        offsets = np.searchsorted(source[by_source], np.arange(faces + 1)).tolist()
+        flip = [None] * faces
+        for seed in range(faces):
+            if flip[seed] is not None:
+                continue
+            flip[seed] = False
+            queue = [seed]
+            while queue:
+                face = queue.pop()
+                for k in range(offsets[face], offsets[face + 1]):
+                    wanted = flip[face] != flips[k]
+                    other = target[k]
+                    if flip[other] is None:
+                        flip[other] = wanted
+                        queue.append(other)
+                    elif flip[other] != wanted:
+                        return None
+        return np.array(flip, dtype=bool)
+
+    @classmethod
+    def validate(cls, verts, loop_start, loop_total, loop_verts, name=None):
+        """Closed manifold buffers with consistent winding, or OCCMeshError"""
+        with OCCTrace.span("validate", faces=len(loop_start)) as counts:
+            label = f"Mesh {name}" if name else "Mesh"
+            if not len(loop_start):
+                raise OCCMeshError(f"{label} has no faces")
+            if not OCCUtils.is_closed_manifold(verts, loop_start, loop_total, loop_verts):
+                loop_start, loop_total, loop_verts = cls.repair(verts, loop_start, loop_total, loop_verts, label, counts)
+            degenerate = np.flatnonzero(cls.degenerate(verts, loop_start, loop_total, loop_verts, cls.area_tolerance))
+            if len(degenerate):
+                shown = ", ".join(str(i) for i in degenerate[:cls.samples])
+                more = f" and {len(degenerate) - cls.samples} more" if len(degenerate) > cls.samples else ""
+                raise OCCMeshError(f"{label} has {len(degenerate)} zero-area faces: {shown}{more}")
+            return verts, loop_start, loop_total, loop_verts
+
+    @staticmethod
+    def degenerate(verts, loop_start, loop_total, loop_verts, tol):
+        """Polygons whose Newell normal (twice the area) is below tol relative to the mesh size"""
+        a, b = OCCUtils.loop_edges(loop_start, loop_total, loop_verts)
+        newell = np.add.reduceat(np.cross(verts[a], verts[b]), loop_start, axis=0) if len(loop_start) else np.zeros((0, 3))
+        return np.linalg.norm(newell, axis=1) < (tol * OCCUtils.extent(verts)) ** 2
+
+    @classmethod
+    def repair(cls, verts, loop_start, loop_total, loop_verts, label, counts):
+        order, a, b, polygon, edge_counts = cls.edges(verts, loop_start, loop_total, loop_verts)
+        if (edge_counts != 2).any():
+            tol = cls.weld_tolerance * OCCUtils.extent(verts)
+            loop_start, loop_total, loop_verts = cls.weld(verts, loop_start, loop_total, loop_verts, tol)
+            counts['welded_faces'] = len(loop_start)
+            if not len(loop_start):
+                raise OCCMeshError(f"{label} has no faces left after welding")
+            order, a, b, polygon, edge_counts = cls.edges(verts, loop_start, loop_total, loop_verts)
+        problems = [cls.describe(verts, a, b, mask, what) for mask, what in
+                    ((edge_counts == 1, "boundary"), (edge_counts > 2, "non-manifold")) if mask.any()]
+        if problems:
+            raise OCCMeshError(f"{label} is not watertight: {'; '.join(problems)}")
+        flip = cls.orient(a, b, polygon, order, edge_counts, len(loop_start))
+        if flip is None:
+            raise OCCMeshError(f"{label} is not orientable (one-sided surface)")
+        counts['flipped'] = int(flip.sum())
+        if flip.any():
+            # reverse each flipped polygon's loop in place
+            starts = np.repeat(loop_start, loop_total)
+            index = np.arange(len(loop_verts))
+            flipped = np.repeat(flip, loop_total)
+            index[flipped] = 2 * starts[flipped] + np.repeat(loop_total, loop_total)[flipped] - 1 - index[flipped]
+            loop_verts = loop_verts[index]
+        return loop_start, loop_total, loop_verts
+
+    @staticmethod
+    def fix(shape, tol=1e-6):
+        with OCCTrace.span("shape_fix"):
+            fixer = OCCModules.get('ShapeFix').ShapeFix_Shape(shape)
+            fixer.SetPrecision(tol)
+            fixer.Perform()
+            return fixer.Shape()
+
 class OCCUtils:
     @staticmethod
     def import_occ(*modules):
-        results = {}
-        for module in modules:
-            try:
-                exec(f"from OCC.Core import {module}")
-                results[module] = eval(module)
-            except ImportError as e:
-                raise ImportError(f"Failed to import {module}: {e}")
-        return results
+        return {module: OCCModules.get(module) for module in modules}
 
     @staticmethod
-    def mesh_to_points(obj):
-        mesh = obj.data.copy()
-        verts = np.array([v.co for v in mesh.vertices])
-        matrix = np.array(obj.matrix_world)
-        verts = np.c_[verts, np.ones(len(verts))] @ matrix.T
-        verts = verts[:, :3]
-        bpy.data.meshes.remove(mesh)
+    def mesh_buffers(obj, world=True):
+        """Flat vertex, polygon and loop arrays read straight from the mesh, no datablock copy"""
+        with OCCTrace.span("mesh_buffers", vertices=len(obj.data.vertices), faces=len(obj.data.polygons)):
+            return OCCUtils.read_buffers(obj, world)
+
+    @staticmethod
+    def read_buffers(obj, world):
+        verts, loop_start, loop_total, loop_verts = OCCUtils.mesh_arrays(obj.data)
+        if world:
+            verts = OCCUtils.transform_points(verts, np.array(obj.matrix_world))
+        return verts, loop_start, loop_total, loop_verts
+
+    @staticmethod
+    def mesh_arrays(mesh):
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        verts = co.reshape(-1, 3).astype(np.float64)
+        loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+        loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_start", loop_start)
+        mesh.polygons.foreach_get("loop_total", loop_total)
+        loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+        return verts, loop_start, loop_total, loop_verts
+
+    @staticmethod
+    def transform_points(verts, matrix):
+        verts = verts @ matrix[:3, :3].T
+        verts += matrix[:3, 3]
         return verts
 
     @staticmethod
-    def create_solid(obj):
+    def trsf_matrix(trsf):
+        """4x4 array from a gp_Trsf; arrays pass through"""
+        if hasattr(trsf, 'Value'):
+            return np.array([[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)] + [[0, 0, 0, 1]])
+        return np.asarray(trsf, dtype=np.float64)
+
+    @staticmethod
+    def transformed_object(obj, matrix, name, bake=False):
+        """Copy of obj moved by matrix, either on the object matrix or baked into
+        the vertex buffer. Copying a mesh datablock stays in C, so this takes milliseconds."""
+        mesh, world = OCCUtils.transformed_mesh(obj, matrix, name, bake)
+        result = bpy.data.objects.new(name, mesh)
+        result.matrix_world = world.tolist()
+        return result
+
+    @staticmethod
+    def transformed_mesh(obj, matrix, name, bake=False):
+        """Copy of obj's mesh and the world matrix to give it"""
+        world = matrix @ np.array(obj.matrix_world)
+        mesh = obj.data.copy()
+        mesh.name = name
+        if bake:
+            co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", co)
+            co = OCCUtils.transform_points(co.reshape(-1, 3).astype(np.float64), world)
+            mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+            mesh.update()
+            OCCShapeCache.alias(obj, mesh, world)
+        return mesh, (np.eye(4) if bake else world)
+
+    @staticmethod
+    def mesh_to_points(obj):
+        return OCCUtils.mesh_buffers(obj)[0]
+
+    @staticmethod
+    def polygons(loop_start, loop_total, loop_verts):
+        loop_verts = loop_verts.tolist()
+        for start, total in zip(loop_start.tolist(), loop_total.tolist()):
+            yield tuple(loop_verts[start:start + total])
+
+    @staticmethod
+    def components(count, first, second):
+        """Label (smallest member) of the connected piece each of count items is in,
+        given linked pairs; union-find done over whole arrays until nothing changes"""
+        parent = np.arange(count)
+        while len(first):
+            roots = np.minimum(parent[first], parent[second])
+            np.minimum.at(parent, parent[first], roots)
+            np.minimum.at(parent, parent[second], roots)
+            parent = parent[parent]
+            if (parent[first] == parent[second]).all() and (parent[parent] == parent).all():
+                break
+        return parent
+
+    @staticmethod
+    def extent(verts):
+        """Bounding box diagonal, the length relative tolerances are scaled by"""
+        size = float(np.linalg.norm(verts.max(axis=0) - verts.min(axis=0))) if len(verts) else 0.0
+        return size or 1.0
+
+    @staticmethod
+    def loop_edges(loop_start, loop_total, loop_verts):
+        """Directed (from, to) vertex pairs for every loop"""
+        first = np.repeat(loop_start, loop_total)
+        following = np.arange(len(loop_verts)) + 1
+        wrap = following == first + np.repeat(loop_total, loop_total)
+        following[wrap] = first[wrap]
+        return loop_verts, loop_verts[following]
+
+    @staticmethod
+    def create_solid(obj, sew=False):
+        return OCCUtils.buffers_to_solid(*OCCUtils.mesh_buffers(obj), sew=sew, name=obj.name)
+
+    @staticmethod
+    def buffers_to_solid(*buffers, sew=False, name=None):
+        buffers = OCCMeshValidator.validate(*buffers, name=name)
+        solid = OCCUtils.sewn_solid(*buffers) if sew else OCCUtils.shared_solid(*buffers)
+        return OCCMeshValidator.fix(solid) if OCCMeshValidator.shape_fix else solid
+
+    @staticmethod
+    def is_closed_manifold(verts, loop_start, loop_total, loop_verts):
+        """Every edge is walked exactly once in each direction: the sorted directed
+        edge keys have no repeats and equal the sorted reversed keys"""
+        a, b = OCCUtils.loop_edges(loop_start, loop_total, loop_verts)
+        a, b = a.astype(np.int64), b.astype(np.int64)
+        directed = np.sort(a * len(verts) + b)
+        if (directed[1:] == directed[:-1]).any():
+            return False
+        return bool(np.array_equal(directed, np.sort(b * len(verts) + a)))
+
+    @staticmethod
+    def shared_solid(verts, loop_start, loop_total, loop_verts, tol=1e-6):
+        """Build the shell directly, creating each vertex and edge once and
+        sharing it between the faces on either side. Needs closed manifold input.
+        tol is relative to the bounding box diagonal."""
+        oc = OCCUtils.import_occ('BRep', 'gp', 'TopoDS', 'BRepBuilderAPI', 'BRepLib')
+        builder = oc['BRep'].BRep_Builder()
+        vertices, edges = {}, {}
+        linear = tol * OCCUtils.extent(verts)
+
+        def vertex(i):
+            if i not in vertices:
+                vertices[i] = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeVertex(oc['gp'].gp_Pnt(*verts[i])).Vertex()
+            return vertices[i]
+
+        def edge(a, b):
+            key = (a, b) if a < b else (b, a)
+            if key not in edges:
+                edges[key] = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeEdge(vertex(key[0]), vertex(key[1])).Edge()
+            return edges[key] if key[0] == a else edges[key].Reversed()
+
+        def faces(loop):
+            pts = verts[list(loop)]
+            center = pts.mean(axis=0)
+            # Newell normal follows the loop winding, so the face keeps Blender's orientation
+            normal = np.cross(pts, np.roll(pts, -1, axis=0)).sum(axis=0)
+            length = np.linalg.norm(normal)
+            if length < linear ** 2:
+                raise OCCMeshError(f"Zero-area face {loop} would leave a hole in the shell")
+            normal /= length
+            if len(loop) > 3 and np.abs((pts - center) @ normal).max() > linear:
+                for i in range(1, len(loop) - 1):
+                    yield from faces((loop[0], loop[i], loop[i + 1]))
+                return
+            wire = oc['TopoDS'].TopoDS_Wire()
+            builder.MakeWire(wire)
+            for a, b in zip(loop, loop[1:] + loop[:1]):
+                builder.Add(wire, edge(a, b))
+            wire.Closed(True)
+            plane = oc['gp'].gp_Pln(oc['gp'].gp_Pnt(*center), oc['gp'].gp_Dir(*normal))
+            yield oc['BRepBuilderAPI'].BRepBuilderAPI_MakeFace(plane, wire, True).Face()
+
+        with OCCTrace.span("build_faces", polygons=len(loop_start)) as counts:
+            shell = oc['TopoDS'].TopoDS_Shell()
+            builder.MakeShell(shell)
+            for poly in OCCUtils.polygons(loop_start, loop_total, loop_verts):
+                for face in faces(poly):
+                    builder.Add(shell, face)
+            shell.Closed(True)
+            counts.update(vertices=len(vertices), edges=len(edges))
+
+        with OCCTrace.span("make_solid"):
+            solid = oc['TopoDS'].TopoDS_Solid()
+            builder.MakeSolid(solid)
+            builder.Add(solid, shell)
+            oc['BRepLib'].breplib.OrientClosedSolid(solid)
+        return solid
+
+    @staticmethod
+    def sewn_solid(verts, loop_start, loop_total, loop_verts, tol=1e-6):
+        """Per-polygon wires stitched together by sewing. Input is validated like
+        shared_solid's, so this is only the slower builder, kept for comparison"""
         oc = OCCUtils.import_occ('BRep', 'gp', 'TopoDS', 'BRepBuilderAPI', 'TopAbs')
-        verts = OCCUtils.mesh_to_points(obj)
-    
+
         compound = oc['TopoDS'].TopoDS_Compound()
         builder = oc['BRep'].BRep_Builder()
         builder.MakeCompound(compound)
-    
-        for poly in obj.data.polygons:
-            points = [oc['gp'].gp_Pnt(*verts[idx]) for idx in poly.vertices]
-            wire = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeWire()
 
-            for i in range(len(points)):
-                edge = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeEdge(points[i], points[(i + 1) % len(points)]).Edge()
-                wire.Add(edge)
-            
-            if wire.IsDone():
-                face = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeFace(wire.Wire()).Face()
-                builder.Add(compound, face)
-    
-        sewing = oc['BRepBuilderAPI'].BRepBuilderAPI_Sewing(1e-6)
-        sewing.Add(compound)
-        sewing.Perform()
-        
-        solid = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeSolid()
-        solid.Add(oc['TopoDS'].topods.Shell(sewing.SewedShape()))
-        result = solid.Solid()
-        
+        with OCCTrace.span("build_faces", polygons=len(loop_start), edges=len(loop_verts)):
+            for poly in OCCUtils.polygons(loop_start, loop_total, loop_verts):
+                points = [oc['gp'].gp_Pnt(*verts[idx]) for idx in poly]
+                wire = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeWire()
+
+                for i in range(len(points)):
+                    edge = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeEdge(points[i], points[(i + 1) % len(points)]).Edge()
+                    wire.Add(edge)
+
+                if wire.IsDone():
+                    face = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeFace(wire.Wire()).Face()
+                    builder.Add(compound, face)
+
+        with OCCTrace.span("sewing"):
+            sewing = oc['BRepBuilderAPI'].BRepBuilderAPI_Sewing(tol)
+            sewing.Add(compound)
+            sewing.Perform()
+
+        with OCCTrace.span("make_solid"):
+            solid = oc['BRepBuilderAPI'].BRepBuilderAPI_MakeSolid()
+            solid.Add(oc['TopoDS'].topods.Shell(sewing.SewedShape()))
+            result = solid.Solid()
+
         return result
 
     @staticmethod
-    def shape_to_mesh(shape, name="OCCMesh"):
-        oc = OCCUtils.import_occ('BRepMesh', 'TopAbs', 'TopLoc', 'TopExp', 'TopoDS', 'BRep')
-        mesh = bpy.data.meshes.new(name)
-        verts, faces = [], []
-        
-        oc['BRepMesh'].BRepMesh_IncrementalMesh(shape, 0.1)
+    def shape_to_mesh(shape, name="OCCMesh", weld=False, tol=1e-6, level='medium'):
+        verts, tris = OCCUtils.shape_to_arrays(shape, weld, tol, level)
+        mesh = OCCUtils.arrays_to_mesh(verts, tris, name)
+        OCCTessellation.add_source(mesh, shape)
+        return mesh
+
+    @staticmethod
+    def shape_to_arrays(shape, weld=False, tol=1e-6, level='medium'):
+        return OCCTessellation.arrays(shape, level, weld, tol)
+
+    @staticmethod
+    def triangulation_arrays(shape, weld=False, tol=1e-6):
+        """Copy an existing triangulation into float32 node and int32 triangle arrays.
+        Face locations and orientation are applied per face with NumPy, but pythonocc
+        only exposes nodes and triangles one at a time, so reading them still costs two
+        SWIG calls per node and per triangle; that is the floor of this path."""
+        oc = OCCUtils.import_occ('TopAbs', 'TopLoc', 'TopExp', 'TopoDS', 'BRep')
+
+        faces, node_count, tri_count = [], 0, 0
         explorer = oc['TopExp'].TopExp_Explorer(shape, oc['TopAbs'].TopAbs_FACE)
-        
         while explorer.More():
             face = oc['TopoDS'].topods.Face(explorer.Current())
             loc = oc['TopLoc'].TopLoc_Location()
             tri = oc['BRep'].BRep_Tool.Triangulation(face, loc)
-            
             if tri:
-                offset = len(verts)
-                transform = loc.Transformation()
-                verts.extend((tri.Node(i).Transformed(transform).Coord()) for i in range(1, tri.NbNodes() + 1))
-                
-                forward = face.Orientation() == oc['TopAbs'].TopAbs_FORWARD
-                for i in range(1, tri.NbTriangles() + 1):
-                    n1, n2, n3 = tri.Triangle(i).Get()
-                    faces.append((offset + n1 - 1, offset + (n2 if forward else n3) - 1, offset + (n3 if forward else n2) - 1))
+                faces.append((face, loc, tri))
+                node_count += tri.NbNodes()
+                tri_count += tri.NbTriangles()
             explorer.Next()
-            
-        mesh.from_pydata(verts, [], faces)
-        mesh.update()
+
+        verts = np.empty((node_count, 3), dtype=np.float32)
+        tris = np.empty((tri_count, 3), dtype=np.int32)
+        reversed_tris = np.zeros(tri_count, dtype=bool)
+        node_at = tri_at = 0
+        for face, loc, tri in faces:
+            nodes, count = tri.NbNodes(), tri.NbTriangles()
+            local = np.array([tri.Node(i).Coord() for i in range(1, nodes + 1)], dtype=np.float64)
+            if not loc.IsIdentity():
+                trsf = loc.Transformation()
+                matrix = np.array([[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)])
+                local = local @ matrix[:, :3].T + matrix[:, 3]
+            verts[node_at:node_at + nodes] = local
+            tris[tri_at:tri_at + count] = np.array([tri.Triangle(i).Get() for i in range(1, count + 1)], dtype=np.int32)
+            tris[tri_at:tri_at + count] += node_at - 1
+            reversed_tris[tri_at:tri_at + count] = face.Orientation() != oc['TopAbs'].TopAbs_FORWARD
+            node_at += nodes
+            tri_at += count
+        tris[reversed_tris] = tris[reversed_tris][:, [0, 2, 1]]
+
+        if weld and node_count:
+            keys = np.round(verts / tol).astype(np.int64)
+            _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+            verts = verts[first]
+            tris = inverse.reshape(-1)[tris].astype(np.int32)
+            tris = tris[(tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 2] != tris[:, 0])]
+        return verts, tris
+
+    @staticmethod
+    def arrays_to_mesh(verts, tris, name="OCCMesh"):
+        with OCCTrace.span("build_mesh", vertices=len(verts), triangles=len(tris)):
+            return OCCUtils.fill_mesh(bpy.data.meshes.new(name), verts, tris)
+
+    @staticmethod
+    def fill_mesh(mesh, verts, tris):
+        mesh.vertices.add(len(verts))
+        mesh.loops.add(tris.size)
+        mesh.polygons.add(len(tris))
+        mesh.vertices.foreach_set("co", np.ascontiguousarray(verts, dtype=np.float32).ravel())
+        mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(tris, dtype=np.int32).ravel())
+        mesh.polygons.foreach_set("loop_start", np.arange(0, tris.size, 3, dtype=np.int32))
+        mesh.update(calc_edges=True)
         return mesh
 
     @staticmethod
@@ -147,6 +1216,644 @@ class OCCUtils:
                             space.text = bpy.data.texts[text_name]
         bpy.app.timers.register(switch, first_interval=0.01)
 
+class OCCJob:
+    def __init__(self, operation, func, context):
+        self.operation = operation
+        self.func = func
+        self.level = context.scene.occ_lod
+        self.wrapper = OCCWrapper(OCCContextSnapshot(context), self)
+        self.stage = "Queued"
+        self.fraction = 0.0
+        self.cancelled = False
+        self.future = None
+
+    def update(self, stage, fraction=None):
+        if self.cancelled:
+            raise OCCCancelled(self.operation)
+        self.stage = stage
+        if fraction is not None:
+            self.fraction = fraction
+
+    def run(self):
+        """Worker side: run the operation and tessellate, returning plain arrays"""
+        with OCCTrace.span(self.operation):
+            self.update("Running")
+            shape = self.func(self.wrapper)
+            if shape is None:
+                return None
+            self.update("Tessellating", 0.9)
+            return (shape, *OCCUtils.shape_to_arrays(shape, weld=True, level=self.level))
+
+class OCCJobQueue:
+    """Operations queued on a worker pool, with results turned into meshes from a timer
+    on the main thread. One worker keeps presses pipelined in click order."""
+    max_workers = 1
+    poll_interval = 0.2
+    jobs = []
+    messages = []
+    _executor = None
+
+    @classmethod
+    def submit(cls, operation, func, context):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.max_workers, thread_name_prefix="occ")
+        job = OCCJob(operation, func, context)
+        job.future = cls._executor.submit(job.run)
+        cls.jobs.append(job)
+        if not bpy.app.timers.is_registered(occ_job_queue_poll):
+            bpy.app.timers.register(occ_job_queue_poll, first_interval=cls.poll_interval)
+        return job
+
+    @classmethod
+    def cancel(cls):
+        for job in cls.jobs:
+            job.cancelled = True
+            job.future.cancel()
+
+    @classmethod
+    def poll(cls):
+        for job in [job for job in cls.jobs if job.future.done()]:
+            cls.jobs.remove(job)
+            cls.finish(job)
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+        return cls.poll_interval if cls.jobs else None
+
+    @classmethod
+    def finish(cls, job):
+        cls.messages = list(job.wrapper.messages)
+        if OCCTrace.operations and OCCTrace.operations[-1]['name'] == job.operation:
+            OCCTrace.publish_profile(OCCTrace.operations[-1])
+        if job.future.cancelled():
+            cls.messages.append(('WARNING', f"{job.operation} cancelled"))
+            return
+        try:
+            result = job.future.result()
+        except OCCCancelled:
+            cls.messages.append(('WARNING', f"{job.operation} cancelled"))
+            return
+        except Exception as e:
+            cls.messages.append(('ERROR', f"Custom operation failed: {str(e)}"))
+            return
+        if result is not None:
+            shape, verts, tris = result
+            mesh = OCCUtils.arrays_to_mesh(verts, tris, f"{job.operation}_Result")
+            OCCTessellation.add_source(mesh, shape)
+            OCCShapePayload.store(mesh, shape)
+            obj = bpy.data.objects.new(mesh.name, mesh)
+            bpy.context.scene.collection.objects.link(obj)
+            snapshot = job.wrapper.context
+            OCCGraph.record(obj, job.operation, snapshot.active_object, snapshot.selected_objects, job.level)
+
+# Blender tells timers apart by function object and cls.poll is a new bound method on
+# every access, so timers go through module-level functions that can be found again
+def occ_job_queue_poll():
+    return OCCJobQueue.poll()
+
+class OCCCommandIndex:
+    """Commands in the command packages: blenderocc/operators next to the real addon
+    file, plus directories listed in BLENDEROCC_COMMAND_PATH. Names, labels and
+    docstrings are read from the source with ast, so listing commands imports
+    nothing; a module is executed with the addon's globals the first time one of its
+    commands is used, and again only after the file changes. The directories are
+    scanned at most once per scan_interval, so panel redraws touch no files."""
+    root = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'blenderocc')
+    paths = [os.path.join(root, 'operators'),
+             *filter(None, os.environ.get('BLENDEROCC_COMMAND_PATH', '').split(os.pathsep))]
+    scan_interval = 1.0
+    stats = {'parses': 0, 'loads': 0}
+    errors = {}
+    _entries = None
+    _scanned = 0.0
+    _files = {}
+    _modules = {}
+    _lock = threading.RLock()
+
+    @classmethod
+    def files(cls):
+        for directory in cls.paths:
+            if os.path.isdir(directory):
+                for filename in sorted(os.listdir(directory)):
+                    if filename.endswith('.py') and not filename.startswith('_'):
+                        yield os.path.join(directory, filename)
+
+    @staticmethod
+    def parse(path):
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        entries = {}
+        for node in tree.body:
+            if not isinstance(node, ast.FunctionDef):
+                continue
+            for decorator in node.decorator_list:
+                if isinstance(decorator, ast.Call) and getattr(decorator.func, 'id', None) == 'occ_operation':
+                    options = {keyword.arg: ast.literal_eval(keyword.value) for keyword in decorator.keywords}
+                    label = ast.literal_eval(decorator.args[0]) if decorator.args else options.get('name', node.name)
+                    entries[node.name] = {'path': path, 'label': label, 'doc': ast.get_docstring(node),
+                                          'background': options.get('background', False),
+                                          'transform': options.get('transform', False)}
+        return entries
+
+    @classmethod
+    def entries(cls):
+        """name -> index entry; a file is parsed again only when its mtime changes"""
+        with cls._lock:
+            if cls._entries is not None and time.monotonic() - cls._scanned < cls.scan_interval:
+                return cls._entries
+            entries = {}
+            for path in cls.files():
+                mtime = os.path.getmtime(path)
+                if cls._files.get(path, (None,))[0] != mtime:
+                    cls.stats['parses'] += 1
+                    try:
+                        cls._files[path] = (mtime, cls.parse(path))
+                        cls.errors.pop(path, None)
+                    except (SyntaxError, ValueError) as e:
+                        cls._files[path] = (mtime, {})
+                        cls.errors[path] = str(e)
+                entries.update(cls._files[path][1])
+            cls._entries, cls._scanned = entries, time.monotonic()
+        return entries
+
+    @classmethod
+    def load(cls, path):
+        with cls._lock:
+            mtime = os.path.getmtime(path)
+            if cls._modules.get(path, (None,))[0] != mtime:
+                stem = os.path.splitext(os.path.basename(path))[0]
+                spec = importlib.util.spec_from_file_location(f"occ_commands.{stem}", path)
+                module = importlib.util.module_from_spec(spec)
+                module.__dict__.update((name, value) for name, value in globals().items() if not name.startswith('__'))
+                with OCCTrace.span(f"load {stem}"):
+                    spec.loader.exec_module(module)
+                cls.stats['loads'] += 1
+                cls._modules[path] = (mtime, module)
+            return cls._modules[path][1]
+
+    @classmethod
+    def get(cls, name):
+        entry = cls.entries().get(name)
+        func = getattr(cls.load(entry['path']), name, None) if entry else None
+        return func if hasattr(func, 'is_occ_op') else None
+
+    @classmethod
+    def core(cls, name):
+        """Shared helper module from blenderocc/core, loaded the same way"""
+        return cls.load(os.path.join(cls.root, 'core', f"{name}.py"))
+
+class OCCCommandRegistry:
+    """custom_commands.py compiled and executed once per content hash, shared by
+    the panel, menu, tooltip and operator. Its commands override the indexed ones."""
+    text_name = "custom_commands.py"
+    stats = {'compiles': 0, 'execs': 0}
+    _key = None
+    _code = None
+    _namespace = {}
+    _error = None
+
+    @classmethod
+    def load(cls):
+        text = bpy.data.texts.get(cls.text_name)
+        if text is None:
+            cls._key, cls._error = None, None
+            return None
+        source = text.as_string()
+        key = hashlib.sha1(source.encode()).hexdigest()
+        if key != cls._key:
+            cls._key, cls._code, cls._namespace, cls._error = key, None, {}, None
+            try:
+                cls._code = compile(source, cls.text_name, 'exec')
+                cls.stats['compiles'] += 1
+                cls._namespace = cls.execute()
+            except Exception as e:
+                cls._error = e
+        if cls._error:
+            raise cls._error
+        return cls._namespace
+
+    @classmethod
+    def commands(cls):
+        """The text's namespace, or nothing while it fails to run, so a typo in the
+        scratch file leaves the package commands working"""
+        try:
+            return cls.load() or {}
+        except Exception:
+            return {}
+
+    @classmethod
+    def execute(cls, **names):
+        """Run the compiled text in a fresh namespace"""
+        loc = dict(names)
+        exec(cls._code, globals(), loc)
+        cls.stats['execs'] += 1
+        return loc
+
+    @classmethod
+    def operations(cls):
+        return [(name, func) for name, func in cls.commands().items() if hasattr(func, 'is_occ_op')]
+
+    @classmethod
+    def get(cls, name):
+        func = cls.commands().get(name)
+        return func if hasattr(func, 'is_occ_op') else OCCCommandIndex.get(name)
+
+    @classmethod
+    def doc(cls, name):
+        func = cls.commands().get(name)
+        if hasattr(func, 'is_occ_op'):
+            return func.__doc__
+        entry = OCCCommandIndex.entries().get(name)
+        return entry['doc'] if entry else None
+
+    @staticmethod
+    def draw(layout):
+        labels = {name: entry['label'] for name, entry in OCCCommandIndex.entries().items()}
+        for path, error in OCCCommandIndex.errors.items():
+            layout.label(text=f"{os.path.basename(path)}: {error}", icon='ERROR')
+        labels.update((name, func.op_name) for name, func in OCCCommandRegistry.operations())
+        if OCCCommandRegistry._error:
+            layout.label(text=f"Error: {str(OCCCommandRegistry._error)}")
+        for name, label in labels.items():
+            if name == 'call_ai':
+                submenu = layout.column()
+                submenu.popover(panel="TEXT_PT_ai_panel", text=label)
+            else:
+                op = layout.operator("occ.custom", text=label)
+                op.operation = name
+
+class OCCAssistant:
+    """AI requests for call_ai, sent from a worker thread so the UI keeps running.
+    Instead of whole files, the request carries prompt.txt and the functions whose
+    names and source share the most words with the message, within a character
+    budget. Replies are cached on disk under a hash of the full request, so asking
+    the same thing about unchanged code costs nothing. BLENDEROCC_AI_ENDPOINT points
+    the requests at another server speaking the same messages API, e.g. a local
+    stand-in for testing or offline use."""
+    endpoint = os.environ.get('BLENDEROCC_AI_ENDPOINT', 'https://api.anthropic.com/v1/messages')
+    model = os.environ.get('BLENDEROCC_AI_MODEL', 'claude-3-5-sonnet-20241022')
+    cache_dir = os.environ.get('BLENDEROCC_AI_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'blenderocc', 'ai'))
+    system = ("You are a CAD expert specializing in OpenCascade and Blender integration. "
+              "Focus on providing practical solutions and code examples.")
+    default_message = "Suggest 1 thing to improve the program."
+    max_tokens = 512
+    context_chars = 24000
+    relevance = 0.3
+    timeout = 120
+    poll_interval = 0.5
+    status = ""
+    future = None
+    _started = 0.0
+    _executor = None
+
+    @staticmethod
+    def definitions(source):
+        """(qualified name, source lines) of each function and method"""
+        lines = source.splitlines()
+        for node in ast.parse(source).body:
+            items = [(f"{node.name}.", item) for item in node.body] if isinstance(node, ast.ClassDef) else [("", node)]
+            for prefix, item in items:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    start = min([item.lineno] + [d.lineno for d in item.decorator_list]) - 1
+                    yield prefix + item.name, "\n".join(lines[start:item.end_lineno])
+
+    @classmethod
+    def excerpts(cls, message, sources):
+        """Code from sources ({filename: text}) most related to the message. Words are
+        weighted by how few definitions contain them, so 'self' or 'the' count for little"""
+        definitions = []
+        for filename, source in sources.items():
+            try:
+                definitions += [(filename, order, name, code, code.lower())
+                                 for order, (name, code) in enumerate(cls.definitions(source))]
+            except SyntaxError:
+                continue
+        words = set(re.findall(r"[a-z]{3,}", message.lower()))
+        weights = {}
+        for word in words:
+            count = sum(word in lower for *_, lower in definitions)
+            if count:
+                weights[word] = np.log(len(definitions) / count)
+        scored = []
+        for filename, order, name, code, lower in definitions:
+            score = sum(weight * (3 if word in name.lower() else 1) for word, weight in weights.items() if word in lower)
+            scored.append((score, filename, order, name, code))
+        best = max([item[0] for item in scored], default=0)
+        chosen, used = [], 0
+        for score, filename, order, name, code in sorted(scored, key=lambda item: -item[0]):
+            if score > 0 and score >= best * cls.relevance and used + len(code) <= cls.context_chars:
+                chosen.append((filename, order, name, code))
+                used += len(code)
+        parts, current = [], None
+        for filename, order, name, code in sorted(chosen):
+            if filename != current:
+                parts.append(f"# {filename} (excerpts)")
+                current = filename
+            parts.append(f"# {name}\n{code}")
+        return "\n\n".join(parts) or "# No code matched the request."
+
+    @staticmethod
+    def sources():
+        """Open texts win over the files on disk, so unsaved edits are what gets sent"""
+        paths = {name: os.path.join(OCCEditOperator.get_template_path(), name)
+                 for name in ('prompt.txt', 'blenderocc.py', OCCCommandRegistry.text_name)}
+        core = os.path.join(OCCCommandIndex.root, 'core')
+        modules = list(OCCCommandIndex.files())
+        if os.path.isdir(core):
+            modules += [os.path.join(core, name) for name in sorted(os.listdir(core)) if name.endswith('.py')]
+        paths.update((os.path.relpath(path, os.path.dirname(OCCCommandIndex.root)), path) for path in modules)
+        sources = {}
+        for name, path in paths.items():
+            text = bpy.data.texts.get(os.path.basename(name))
+            if text is not None:
+                sources[name] = text.as_string()
+            elif os.path.exists(path):
+                with open(path) as f:
+                    sources[name] = f.read()
+        return sources
+
+    @classmethod
+    def payload(cls, message, sources):
+        prompt = sources.pop('prompt.txt', "")
+        return {
+            'model': cls.model,
+            'max_tokens': cls.max_tokens,
+            'system': cls.system,
+            'messages': [
+                {'role': 'user', 'content': prompt},
+                {'role': 'assistant', 'content': "Got it. Next, show me the code."},
+                {'role': 'user', 'content': cls.excerpts(message, sources)},
+                {'role': 'assistant', 'content': "Excellent. Now that I understand the program, I can make a suggestion."},
+                {'role': 'user', 'content': message},
+                {'role': 'assistant', 'content': "Here is a short response to that:"},
+            ]}
+
+    @classmethod
+    def cache_path(cls, payload):
+        key = hashlib.blake2b(json.dumps([cls.endpoint, payload], sort_keys=True).encode(), digest_size=16).hexdigest()
+        return os.path.join(cls.cache_dir, f"{key}.json")
+
+    @classmethod
+    def request(cls, payload, path):
+        """Worker side: POST the payload and cache the reply text"""
+        request = urllib.request.Request(cls.endpoint, data=json.dumps(payload).encode(), headers={
+            'x-api-key': os.environ.get('ANTHROPIC_API_KEY', ''),
+            'anthropic-version': '2023-06-01',
+            'content-type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=cls.timeout) as response:
+            reply = json.load(response)
+        text = "".join(block.get('text', "") for block in reply.get('content', []))
+        os.makedirs(cls.cache_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'text': text}, f)
+        return text
+
+    @classmethod
+    def busy(cls):
+        return cls.future is not None and not cls.future.done()
+
+    @classmethod
+    def submit(cls, message):
+        if cls.busy():
+            raise RuntimeError("An AI request is already running")
+        payload = cls.payload(message or cls.default_message, cls.sources())
+        path = cls.cache_path(payload)
+        if os.path.exists(path):
+            with open(path) as f:
+                cls.show(json.load(f)['text'], cached=True)
+            return
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="occ_ai")
+        cls._started = time.monotonic()
+        cls.status = "Waiting for reply"
+        cls.future = cls._executor.submit(cls.request, payload, path)
+        if not bpy.app.timers.is_registered(occ_assistant_poll):
+            bpy.app.timers.register(occ_assistant_poll, first_interval=cls.poll_interval)
+
+    @classmethod
+    def poll(cls):
+        if cls.busy():
+            cls.status = f"Waiting for reply ({time.monotonic() - cls._started:.0f}s)"
+        else:
+            try:
+                cls.show(cls.future.result())
+            except Exception as e:
+                cls.status = f"AI request failed: {str(e)}"
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type in {'TEXT_EDITOR', 'VIEW_3D'}:
+                    area.tag_redraw()
+        return cls.poll_interval if cls.busy() else None
+
+    @classmethod
+    def show(cls, reply, cached=False):
+        """Main thread: put the reply in a new text, on the clipboard and on screen"""
+        text_name = f"ai_response_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+        bpy.data.texts.new(text_name).write(reply)
+        bpy.context.window_manager.clipboard = reply
+        cls.status = f"{'Cached reply' if cached else 'Reply'} in {text_name}"
+        def switch_to_workspace():
+            if "OCC Text" in bpy.data.workspaces:
+                bpy.context.window.workspace = bpy.data.workspaces["OCC Text"]
+            bpy.app.timers.register(lambda: OCCUtils.switch_to_text(text_name), first_interval=0.01)
+        bpy.app.timers.register(switch_to_workspace, first_interval=0.01)
+
+def occ_assistant_poll():
+    return OCCAssistant.poll()
+
+class OCCGraphContext:
+    """Inputs of a graph node in the shape of a context, for rerunning its operation"""
+    def __init__(self, scene, active_object, selected_objects):
+        self.scene = scene
+        self.active_object = active_object
+        self.selected_objects = selected_objects
+
+class OCCGraph:
+    """Operation graph over command results. Each result object keeps the operation,
+    the input object names and fingerprints of those inputs as JSON in its "occ_node"
+    property, so the graph and its clean state survive save and reload. depsgraph
+    updates that change an input mark the node and everything downstream dirty;
+    evaluate() reruns dirty nodes upstream first, replacing result meshes in place.
+    Unchanged inputs and intermediate results come from OCCShapeCache, so only the
+    edited part is converted again."""
+    debounce = 0.5
+    dirty = set()
+    messages = []
+    _due = None
+    _parsed = {}
+
+    @staticmethod
+    def fingerprint(obj):
+        """[transform, mesh] hashes, so a moved object is told apart without hashing its mesh"""
+        return [OCCGraph.matrix_fingerprint(obj), OCCGraph.mesh_fingerprint(obj)]
+
+    @staticmethod
+    def matrix_fingerprint(obj):
+        return OCCShapeCache.key(np.array(obj.matrix_world))
+
+    @staticmethod
+    def mesh_fingerprint(obj):
+        buffers = obj.buffers if isinstance(obj, OCCMeshSnapshot) else OCCUtils.mesh_arrays(obj.data)
+        return OCCShapeCache.key(*buffers)
+
+    @classmethod
+    def record(cls, result, operation, active_object, selected_objects, level, bake=False):
+        inputs = [obj for obj in [active_object, *selected_objects] if obj is not None and obj.type == 'MESH']
+        if not inputs:
+            return
+        result["occ_node"] = json.dumps({
+            'operation': operation, 'level': level, 'bake': bake,
+            'active': active_object.name if active_object is not None else None,
+            'selected': [obj.name for obj in selected_objects if obj.type == 'MESH'],
+            'fingerprints': {obj.name: cls.fingerprint(obj) for obj in inputs}})
+        cls.dirty.discard(result.name)
+
+    @classmethod
+    def nodes(cls):
+        """Parsed "occ_node" of every result, reusing the parse while the JSON is unchanged"""
+        parsed = {}
+        for obj in bpy.data.objects:
+            if "occ_node" in obj:
+                text = obj["occ_node"]
+                entry = cls._parsed.get(obj.name)
+                parsed[obj.name] = entry if entry and entry[0] == text else (text, json.loads(text))
+        cls._parsed = parsed
+        return {name: node for name, (_, node) in parsed.items()}
+
+    @staticmethod
+    def inputs(node):
+        return {name for name in [node['active'], *node['selected']] if name}
+
+    @classmethod
+    def downstream(cls, names, nodes):
+        names = set(names)
+        while True:
+            more = {name for name, node in nodes.items() if name not in names and cls.inputs(node) & names}
+            if not more:
+                return names
+            names |= more
+
+    @classmethod
+    def changed(cls, names, scene):
+        """Mark nodes reading any of the named objects dirty if those really changed"""
+        nodes = cls.nodes()
+        stale = set()
+        # one pass of hashing per update, however many nodes read an object
+        matrices, meshes = {}, {}
+        for name, node in nodes.items():
+            if name in cls.dirty:
+                continue
+            for input_name in cls.inputs(node) & names:
+                obj = bpy.data.objects.get(input_name)
+                recorded = node.get('fingerprints', {}).get(input_name)
+                if obj is None or not recorded:
+                    stale.add(name)
+                    break
+                if input_name not in matrices:
+                    matrices[input_name] = cls.matrix_fingerprint(obj)
+                if matrices[input_name] != recorded[0]:
+                    stale.add(name)
+                    break
+                if input_name not in meshes:
+                    meshes[input_name] = cls.mesh_fingerprint(obj)
+                if meshes[input_name] != recorded[1]:
+                    stale.add(name)
+                    break
+        if stale:
+            cls.dirty |= cls.downstream(stale, nodes)
+            if scene.occ_graph_auto:
+                cls.schedule()
+
+    @classmethod
+    def schedule(cls):
+        """Evaluate once edits have paused for the debounce interval"""
+        cls._due = time.monotonic() + cls.debounce
+        if not bpy.app.timers.is_registered(occ_graph_tick):
+            bpy.app.timers.register(occ_graph_tick, first_interval=cls.debounce)
+
+    @classmethod
+    def tick(cls):
+        if cls._due is None:
+            return None
+        remaining = cls._due - time.monotonic()
+        if remaining > 0:
+            return remaining
+        cls._due = None
+        cls.evaluate(bpy.context.scene)
+        return None
+
+    @classmethod
+    def evaluate(cls, scene):
+        """Rerun dirty nodes, each after the dirty nodes it reads from"""
+        nodes = cls.nodes()
+        cls.dirty &= set(nodes)
+        cls.messages = []
+        pending = set(cls.dirty)
+        while pending:
+            ready = [name for name in nodes if name in pending and not cls.inputs(nodes[name]) & pending]
+            if not ready:
+                cls.messages.append(('ERROR', "Operation graph has a cycle"))
+                return
+            for name in ready:
+                pending.discard(name)
+                try:
+                    with OCCTrace.span(f"graph {name}"):
+                        cls.evaluate_node(scene, bpy.data.objects[name], nodes[name])
+                    cls.dirty.discard(name)
+                except Exception as e:
+                    cls.messages.append(('ERROR', f"{name}: {str(e)}"))
+                    # what reads this node stays dirty instead of rebuilding from a stale result
+                    pending -= cls.downstream({name}, nodes)
+
+    @classmethod
+    def evaluate_node(cls, scene, result, node):
+        func = OCCCommandRegistry.get(node['operation'])
+        if func is None:
+            raise RuntimeError(f"unknown operation {node['operation']}")
+        missing = [name for name in cls.inputs(node) if name not in bpy.data.objects]
+        if missing:
+            raise RuntimeError(f"missing input {', '.join(missing)}")
+        active = bpy.data.objects[node['active']] if node['active'] else None
+        selected = [bpy.data.objects[name] for name in node['selected']]
+        wrapper = OCCWrapper(OCCGraphContext(scene, active, selected))
+        old = result.data
+        name = old.name
+        if func.transform:
+            mesh, world = OCCUtils.transformed_mesh(active, OCCUtils.trsf_matrix(func(wrapper)), name, node['bake'])
+            result.matrix_world = world.tolist()
+        else:
+            shape = func(wrapper)
+            if shape is not None:
+                mesh = wrapper.create_mesh(shape, name, level=node['level'])
+            elif any(level == 'ERROR' for level, _ in wrapper.messages):
+                raise RuntimeError("operation returned no shape")
+            else:
+                # an empty result, e.g. an intersection whose inputs moved apart
+                mesh = bpy.data.meshes.new(name)
+        result.data = mesh
+        if not old.users:
+            # the new mesh was made while the old one held the name; hand the name back
+            bpy.data.meshes.remove(old)
+            OCCTessellation.discard_source(name)
+            source = OCCTessellation.sources.get(mesh.name)
+            OCCTessellation.discard_source(mesh.name)
+            mesh.name = name
+            if source is not None:
+                OCCTessellation.add_source(mesh, source)
+        cls.messages.extend(wrapper.messages)
+        cls.record(result, node['operation'], active, selected, node['level'], node['bake'])
+
+def occ_graph_tick():
+    return OCCGraph.tick()
+
+@bpy.app.handlers.persistent
+def occ_graph_depsgraph_update(scene, depsgraph):
+    names = {update.id.name for update in depsgraph.updates if isinstance(update.id, bpy.types.Object)
+             and (update.is_updated_geometry or update.is_updated_transform)}
+    if names:
+        OCCGraph.changed(names, scene)
+
 class OCCCustomOperator(bpy.types.Operator):
     bl_idname = "occ.custom"
     bl_label = "Execute Custom"
@@ -156,51 +1863,193 @@ class OCCCustomOperator(bpy.types.Operator):
     def description(cls, context, properties):
         """Show docstring of the operation as a tooltip"""
         if properties.operation:
-            text = bpy.data.texts.get("custom_commands.py")
-            if text:
-                try:
-                    loc = {}
-                    exec(text.as_string(), globals(), loc)
-                    if properties.operation in loc:
-                        return loc[properties.operation].__doc__ or "No description available"
-                except:
-                    pass
+            try:
+                return OCCCommandRegistry.doc(properties.operation) or "No description available"
+            except Exception:
+                pass
         return "Execute custom OpenCASCADE operation"
     def execute(self, context):
-        text_name = "custom_commands.py"
-        if text_name not in bpy.data.texts:
+        OCCTrace.memory = context.scene.occ_trace_memory
+        OCCTrace.profile = context.scene.occ_trace_profile
+        OCCMeshValidator.shape_fix = context.scene.occ_shape_fix
+        with OCCTrace.span(self.operation or "Custom_Result"):
+            result = self.run(context)
+        if OCCTrace.operations:
+            OCCTrace.publish_profile(OCCTrace.operations[-1])
+        return result
+
+    def run(self, context):
+        if not self.operation and OCCCommandRegistry.text_name not in bpy.data.texts:
             self.report({'ERROR'}, "Click Custom Code first")
             return {'CANCELLED'}
-            
-        text = bpy.data.texts[text_name]
-        code = text.as_string()
-        
+
         try:
             wrapper = OCCWrapper()
-            loc = {'wrapper': wrapper}
-            exec(code, globals(), loc)
-            
+
             if self.operation:
-                if self.operation in loc:
-                    op_func = loc[self.operation]
-                    if hasattr(op_func, 'is_occ_op'):
-                        result_shape = op_func(wrapper)
-                        if result_shape:
-                            mesh = wrapper.create_mesh(result_shape, f"{self.operation}_Result") 
-                            obj = bpy.data.objects.new(mesh.name, mesh)
-                            context.scene.collection.objects.link(obj)
-                            return {'FINISHED'}
-            elif 'result_shape' in loc:
-                mesh = wrapper.create_mesh(loc['result_shape'], "Custom_Result")
-                obj = bpy.data.objects.new(mesh.name, mesh)
-                context.scene.collection.objects.link(obj)
-                return {'FINISHED'}
-                
+                op_func = OCCCommandRegistry.get(self.operation)
+                if op_func is None:
+                    self.report({'ERROR'}, f"No command named {self.operation}")
+                    return {'CANCELLED'}
+                if op_func and op_func.transform:
+                    return self.apply_transform(context, op_func, wrapper)
+                if op_func and op_func.background and context.scene.occ_background:
+                    OCCJobQueue.submit(self.operation, op_func, context)
+                    self.report({'INFO'}, f"{op_func.op_name} queued")
+                    return {'FINISHED'}
+                if op_func:
+                    result_shape = op_func(wrapper)
+                    for level, message in wrapper.messages:
+                        self.report({level}, message)
+                    if result_shape:
+                        mesh = wrapper.create_mesh(result_shape, f"{self.operation}_Result", level=context.scene.occ_lod)
+                        obj = bpy.data.objects.new(mesh.name, mesh)
+                        context.scene.collection.objects.link(obj)
+                        OCCGraph.record(obj, self.operation, context.active_object, context.selected_objects,
+                                        context.scene.occ_lod)
+                        return {'FINISHED'}
+            else:
+                OCCCommandRegistry.load()
+                loc = OCCCommandRegistry.execute(wrapper=wrapper)
+                if 'result_shape' in loc:
+                    mesh = wrapper.create_mesh(loc['result_shape'], "Custom_Result", level=context.scene.occ_lod)
+                    obj = bpy.data.objects.new(mesh.name, mesh)
+                    context.scene.collection.objects.link(obj)
+                    return {'FINISHED'}
+
         except Exception as e:
             self.report({'ERROR'}, f"Custom operation failed: {str(e)}")
             
         return {'CANCELLED'}
 
+    def apply_transform(self, context, op_func, wrapper):
+        obj = context.active_object
+        if not obj or obj.type != 'MESH':
+            self.report({'ERROR'}, "Select a mesh object to transform")
+            return {'CANCELLED'}
+        trsf = op_func(wrapper)
+        if trsf is None:
+            return {'CANCELLED'}
+        with OCCTrace.span("transform", vertices=len(obj.data.vertices), baked=context.scene.occ_bake_transforms):
+            result = OCCUtils.transformed_object(obj, OCCUtils.trsf_matrix(trsf), f"{self.operation}_Result",
+                                                 context.scene.occ_bake_transforms)
+        context.scene.collection.objects.link(result)
+        OCCGraph.record(result, self.operation, obj, [], context.scene.occ_lod, context.scene.occ_bake_transforms)
+        return {'FINISHED'}
+
+class OCCCancelOperator(bpy.types.Operator):
+    bl_idname = "occ.cancel_jobs"
+    bl_label = "Cancel OCC Jobs"
+
+    def execute(self, context):
+        OCCJobQueue.cancel()
+        return {'FINISHED'}
+
+class OCCGraphUpdateOperator(bpy.types.Operator):
+    bl_idname = "occ.graph_update"
+    bl_label = "Recompute"
+    bl_description = "Rerun the operations whose inputs changed, and everything built on them"
+
+    def execute(self, context):
+        OCCGraph.evaluate(context.scene)
+        for level, message in OCCGraph.messages:
+            self.report({level}, message)
+        return {'FINISHED'}
+
+class OCCRefineOperator(bpy.types.Operator):
+    bl_idname = "occ.refine_mesh"
+    bl_label = "Retessellate"
+    bl_description = "Rebuild the active result mesh from its shape at another level of detail"
+    level: bpy.props.StringProperty(default='fine')
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return obj is not None and obj.type == 'MESH' and (
+            obj.data.name in OCCTessellation.sources or "occ_brep_mesh" in obj.data)
+
+    def execute(self, context):
+        obj = context.active_object
+        old = obj.data
+        shape = OCCTessellation.sources.get(old.name)
+        if shape is None:
+            payload = OCCShapePayload.read(old)
+            if payload is None:
+                self.report({'ERROR'}, "No saved BRep for this mesh")
+                return {'CANCELLED'}
+            shape = OCCShapePayload.shape(payload[1])
+        name = old.name
+        mesh = OCCUtils.shape_to_mesh(shape, name, weld=True, level=self.level)
+        OCCShapePayload.store(mesh, shape)
+        # every object sharing the mesh, e.g. imported part instances, follows
+        old.user_remap(mesh)
+        bpy.data.meshes.remove(old)
+        OCCTessellation.discard_source(mesh.name)
+        mesh.name = name
+        OCCTessellation.add_source(mesh, shape)
+        return {'FINISHED'}
+
+class OCCTraceExportOperator(bpy.types.Operator, ExportHelper):
+    bl_idname = "occ.export_trace"
+    bl_label = "Export Trace"
+    bl_description = "Save recorded OCC stages as Chrome trace-event JSON"
+    filename_ext = ".json"
+
+    def execute(self, context):
+        with open(self.filepath, 'w') as f:
+            json.dump(OCCTrace.chrome_events(), f)
+        self.report({'INFO'}, f"Saved to {self.filepath}")
+        return {'FINISHED'}
+
+class OCCTraceClearOperator(bpy.types.Operator):
+    bl_idname = "occ.clear_trace"
+    bl_label = "Clear Trace"
+
+    def execute(self, context):
+        OCCTrace.operations.clear()
+        return {'FINISHED'}
+
+class OCCImportCADOperator(bpy.types.Operator, ImportHelper):
+    bl_idname = "occ.import_cad"
+    bl_label = "Import STEP/IGES"
+    bl_description = "Import a STEP or IGES assembly, meshing each distinct part once and linking its instances"
+    filter_glob: bpy.props.StringProperty(default="*.step;*.stp;*.iges;*.igs", options={'HIDDEN'})
+    level: bpy.props.EnumProperty(
+        name="Detail",
+        items=[(level, level.title(), "") for level in OCCTessellation.levels],
+        default='medium'
+    )
+    scale: bpy.props.FloatProperty(name="Scale", default=0.001, description="Scene units per file unit (STEP is usually mm)")
+
+    def execute(self, context):
+        try:
+            reader = OCCCADReader(self.filepath)
+        except Exception as e:
+            self.report({'ERROR'}, f"Import failed: {str(e)}")
+            return {'CANCELLED'}
+        collection = bpy.data.collections.new(os.path.basename(self.filepath))
+        context.scene.collection.children.link(collection)
+        meshes = {}
+        count = 0
+        gp = OCCModules.get('gp')
+        units = gp.gp_Trsf()
+        units.SetScale(gp.gp_Pnt(0, 0, 0), self.scale)
+        with OCCTrace.span(f"import {os.path.basename(self.filepath)}") as counts:
+            for key, name, shape, location in reader.instances():
+                if key not in meshes:
+                    # scale the part itself, so the shape kept for Retessellate matches its mesh
+                    shape = OCCModules.get('BRepBuilderAPI').BRepBuilderAPI_Transform(shape, units, True).Shape()
+                    meshes[key] = OCCUtils.shape_to_mesh(shape, name, weld=True, level=self.level)
+                    # the mesh holds the tessellation now, free the BRep triangulation
+                    OCCModules.get('BRepTools').breptools.Clean(shape)
+                obj = bpy.data.objects.new(name, meshes[key])
+                obj.matrix_world = OCCCADReader.matrix(location, self.scale)
+                collection.objects.link(obj)
+                count += 1
+            counts.update(parts=len(meshes), instances=count)
+        self.report({'INFO'}, f"Imported {count} instances of {len(meshes)} parts")
+        return {'FINISHED'}
+
 class OCCEditOperator(bpy.types.Operator):
     bl_idname = "occ.edit_code"
     bl_label = "Edit Code"
@@ -310,24 +2159,54 @@ class VIEW3D_PT_OCCTools(bpy.types.Panel):
         box = layout.box()
         row = box.row()
         row.operator("occ.edit_code", text="Custom Code", icon='TEXT')
-        text_name = "custom_commands.py"
-        if text_name in bpy.data.texts:
-            text = bpy.data.texts[text_name]
-            code = text.as_string()
+        row.prop(context.scene, "occ_background", text="", icon='SORTTIME')
+        for job in OCCJobQueue.jobs:
+            row = box.row()
+            row.label(text=f"{job.operation}: {job.stage} ({job.fraction:.0%})")
+        if OCCJobQueue.jobs:
+            box.operator("occ.cancel_jobs", text="Cancel", icon='CANCEL')
+        row = box.row(align=True)
+        row.prop(context.scene, "occ_lod", text="")
+        row.operator("occ.refine_mesh", text="", icon='MOD_REMESH').level = context.scene.occ_lod
+        row.prop(context.scene, "occ_bake_transforms", text="", icon='ORIENTATION_GLOBAL')
+        row.prop(context.scene, "occ_shape_fix", text="", icon='TOOL_SETTINGS')
+        for level, message in OCCJobQueue.messages:
+            box.label(text=message, icon='ERROR' if level == 'ERROR' else 'INFO')
+        row = box.row(align=True)
+        row.operator("occ.graph_update", text=f"Recompute ({len(OCCGraph.dirty)})" if OCCGraph.dirty else "Recompute",
+                     icon='FILE_REFRESH')
+        row.prop(context.scene, "occ_graph_auto", text="", icon='AUTO')
+        for level, message in OCCGraph.messages:
+            box.label(text=message, icon='ERROR' if level == 'ERROR' else 'INFO')
+        try:
+            OCCCommandRegistry.draw(layout)
+        except Exception as e:
+            layout.label(text=f"Error: {str(e)}")
 
-            try:
-                loc = {}
-                exec(code, globals(), loc)
-                for name, func in loc.items():
-                    if hasattr(func, 'is_occ_op'):
-                        if name == 'call_ai':
-                            submenu = layout.column()
-                            submenu.popover(panel="TEXT_PT_ai_panel", text=func.op_name)
-                        else:
-                            op = layout.operator("occ.custom", text=func.op_name)
-                            op.operation = name
-            except Exception as e:
-                layout.label(text=f"Error: {str(e)}")
+class VIEW3D_PT_OCCTrace(bpy.types.Panel):
+    bl_idname = "VIEW3D_PT_OCCTrace"
+    bl_parent_id = "VIEW3D_PT_OCCTools"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "OCC Tools"
+    bl_label = "Profiling"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        row = layout.row(align=True)
+        row.prop(context.scene, "occ_trace_memory", text="Memory", toggle=True)
+        row.prop(context.scene, "occ_trace_profile", text="cProfile", toggle=True)
+        row = layout.row(align=True)
+        row.operator("occ.export_trace", text="Export", icon='EXPORT')
+        row.operator("occ.clear_trace", text="", icon='TRASH')
+        if not OCCTrace.operations:
+            return
+        col = layout.column(align=True)
+        for depth, record in OCCTrace.walk(OCCTrace.operations[-1]):
+            counts = " ".join(f"{k}={v}" for k, v in record['counts'].items())
+            memory = f" {record['peak_bytes'] / 2**20:.1f}MB" if record['peak_bytes'] else ""
+            col.label(text=f"{'    ' * depth}{record['name']}: {record.get('seconds', 0):.3f}s{memory} {counts}")
 
 class TEXT_MT_occ_menu(bpy.types.Menu):
     bl_idname = "TEXT_MT_occ_menu"
@@ -339,23 +2218,10 @@ class TEXT_MT_occ_menu(bpy.types.Menu):
         layout.operator("occ.edit_code", text="Save To File", icon='FILE_TICK').save_only = True
         layout.separator()
         layout.menu("TEXT_MT_occ_switch_menu", text="Switch Text")
-        text = bpy.data.texts.get("custom_commands.py")
-        if text:
-            try:
-                code = text.as_string()
-                wrapper = OCCWrapper()
-                loc = {'wrapper': wrapper}
-                exec(code, globals(), loc)
-                for name, func in loc.items():
-                    if hasattr(func, 'is_occ_op'):
-                        if name == 'call_ai':
-                            submenu = layout.column()
-                            submenu.popover(panel="TEXT_PT_ai_panel", text=func.op_name)
-                        else:
-                            op = layout.operator("occ.custom", text=func.op_name)
-                            op.operation = name
-            except Exception as e:
-                layout.label(text=f"Error: {str(e)}")
+        try:
+            OCCCommandRegistry.draw(layout)
+        except Exception as e:
+            layout.label(text=f"Error: {str(e)}")
 
 class TEXT_PT_ai_panel(bpy.types.Panel):
     bl_label = "AI Message"
@@ -366,8 +2232,12 @@ class TEXT_PT_ai_panel(bpy.types.Panel):
     def draw(self, context):
         layout = self.layout
         layout.prop(context.scene, "ai_message", text="")
-        op = layout.operator("occ.custom", text="Send")
+        row = layout.row()
+        row.enabled = not OCCAssistant.busy()
+        op = row.operator("occ.custom", text="Send")
         op.operation = "call_ai"
+        if OCCAssistant.status:
+            layout.label(text=OCCAssistant.status, icon='SORTTIME' if OCCAssistant.busy() else 'INFO')
 
 class TEXT_MT_occ_switch_menu(bpy.types.Menu):
     bl_idname = "TEXT_MT_occ_switch_menu"
@@ -390,8 +2260,15 @@ class TextSwitchOperator(bpy.types.Operator):
 
 classes = [
     OCCCustomOperator,
+    OCCCancelOperator,
+    OCCGraphUpdateOperator,
+    OCCRefineOperator,
+    OCCImportCADOperator,
     OCCEditOperator,
     VIEW3D_PT_OCCTools,
+    VIEW3D_PT_OCCTrace,
+    OCCTraceExportOperator,
+    OCCTraceClearOperator,
     TEXT_MT_occ_menu,
     TEXT_MT_occ_switch_menu,
     TEXT_PT_ai_panel,
@@ -400,6 +2277,13 @@ classes = [
 
 addon_keymaps = []
 
+def draw_import_menu(self, context):
+    self.layout.operator(OCCImportCADOperator.bl_idname, text="STEP/IGES (.step, .iges)")
+
+def update_shape_fix(scene, context):
+    OCCMeshValidator.shape_fix = scene.occ_shape_fix
+    OCCShapeCache.clear()
+
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
@@ -409,24 +2293,78 @@ def register():
         default="",
         options={'TEXTEDIT_UPDATE'}
     )
+    bpy.types.Scene.occ_background = bpy.props.BoolProperty(
+        name="Run In Background",
+        description="Queue operations that support it on a worker thread instead of blocking the UI",
+        default=False
+    )
+    bpy.types.Scene.occ_lod = bpy.props.EnumProperty(
+        name="Detail",
+        description="Tessellation level of detail for result meshes",
+        items=[(level, level.title(), "") for level in OCCTessellation.levels],
+        default='medium'
+    )
+    bpy.types.Scene.occ_bake_transforms = bpy.props.BoolProperty(
+        name="Bake Transforms",
+        description="Apply transform commands to the vertices instead of the object matrix",
+        default=False
+    )
+    bpy.types.Scene.occ_shape_fix = bpy.props.BoolProperty(
+        name="Repair Shapes",
+        description="Run ShapeFix_Shape on solids converted from meshes (slower, fixes tolerance and orientation problems)",
+        default=False,
+        update=update_shape_fix
+    )
+    bpy.types.Scene.occ_graph_auto = bpy.props.BoolProperty(
+        name="Auto Recompute",
+        description="Rerun dependent operations shortly after their inputs are edited",
+        default=False
+    )
+    bpy.types.Scene.occ_trace_memory = bpy.props.BoolProperty(
+        name="Trace Memory",
+        description="Record peak Python memory per stage (slows Python-heavy stages)",
+        default=False
+    )
+    bpy.types.Scene.occ_trace_profile = bpy.props.BoolProperty(
+        name="Profile",
+        description="Capture a cProfile of each operation into occ_profile.txt",
+        default=False
+    )
     def draw_occ_menu(self, context):
         self.layout.menu("TEXT_MT_occ_menu")
     global menu_func
     menu_func = draw_occ_menu
     bpy.types.TEXT_MT_editor_menus.append(menu_func)
+    bpy.types.TOPBAR_MT_file_import.append(draw_import_menu)
+    bpy.app.handlers.depsgraph_update_post.append(occ_graph_depsgraph_update)
     wm = bpy.context.window_manager
     kc = wm.keyconfigs.addon
     if kc:
         km = kc.keymaps.new(name='Text', space_type='TEXT_EDITOR')
         kmi = km.keymap_items.new(TextSwitchOperator.bl_idname, type='RIGHT_BRACKET', value='PRESS', ctrl=True)
         addon_keymaps.append((km, kmi))
-    
+    if OCCModules.warm_up_on_register:
+        OCCModules.warm_up()
 
 def unregister():
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.ai_message
+    del bpy.types.Scene.occ_background
+    del bpy.types.Scene.occ_lod
+    del bpy.types.Scene.occ_bake_transforms
+    del bpy.types.Scene.occ_graph_auto
+    del bpy.types.Scene.occ_shape_fix
+    del bpy.types.Scene.occ_trace_memory
+    del bpy.types.Scene.occ_trace_profile
+    OCCJobQueue.cancel()
+    for timer in (occ_job_queue_poll, occ_assistant_poll, occ_graph_tick):
+        if bpy.app.timers.is_registered(timer):
+            bpy.app.timers.unregister(timer)
+    if occ_graph_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(occ_graph_depsgraph_update)
     bpy.types.TEXT_MT_editor_menus.remove(menu_func)
+    bpy.types.TOPBAR_MT_file_import.remove(draw_import_menu)
     for km, kmi in addon_keymaps:
         km.keymap_items.remove(kmi)
-    addon
+    addon_keymaps.clear()
@@ -0,0 +1,76 @@
+def boolean_op(self, operation, fuzzy=1e-5, parallel=True, unify=True):
+    """Boolean operations helper function
+    Takes 2 or more selected blender objects and make BRep shapes. The active
+    object is the argument and every other selection a tool, all combined in a
+    single general-fuse pass of the algorithm named by the operation string.
+    Intersection keeps the part of the argument inside any tool."""
+    import time
+    objects = list(self.context.selected_objects)
+    if len(objects) < 2:
+        self.report('ERROR', "Select at least 2 objects for boolean operations")
+        return None
+    target = self.context.active_object if self.context.active_object in objects else objects[0]
+    timings = {}
+
+    # Bounding boxes decide which objects need a BRep at all
+    start = time.perf_counter()
+    index = OCCSpatialIndex(objects, margin=fuzzy)
+    separate = []
+    if operation == 'Fuse':
+        separate = index.isolated()
+        combined = [obj for obj in objects if obj not in separate]
+        if not combined:
+            self.report('INFO', "No selected objects overlap; grouping them without a Boolean")
+            return self.make_compound([self.get_shape(obj) for obj in objects])
+        target = target if target in combined else combined[0]
+        tools = [obj for obj in combined if obj is not target]
+    else:
+        tools = index.overlapping(target)
+        if not tools and operation == 'Cut':
+            self.report('INFO', "No tool overlaps the active object; difference leaves it unchanged")
+            return self.get_shape(target)
+        if not tools:
+            self.report('WARNING', "Selected objects do not overlap; intersection is empty")
+            return None
+    timings['prefilter'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    shape = self.get_shape(target)
+    tool_shapes = [self.get_shape(obj) for obj in tools]
+    timings['convert'] = time.perf_counter() - start
+
+    BRepAlgoAPI = self.get_module('BRepAlgoAPI')
+    TopTools = self.get_module('TopTools')
+    arguments, tool_list = TopTools.TopTools_ListOfShape(), TopTools.TopTools_ListOfShape()
+    arguments.Append(shape)
+    for tool in tool_shapes:
+        tool_list.Append(tool)
+    self.progress(f"Boolean {operation}", 0.5)
+    start = time.perf_counter()
+    with OCCTrace.span(f"boolean {operation}", arguments=1, tools=len(tool_shapes)):
+        op = getattr(BRepAlgoAPI, f'BRepAlgoAPI_{operation}')()
+        op.SetArguments(arguments)
+        op.SetTools(tool_list)
+        op.SetRunParallel(parallel)
+        op.SetFuzzyValue(fuzzy)
+        op.Build()
+    timings['boolean'] = time.perf_counter() - start
+    if not op.IsDone() or op.HasErrors():
+        self.report('ERROR', f"Boolean {operation} operation failed")
+        return None
+    result = op.Shape()
+
+    if unify:
+        self.progress("Unifying faces", 0.8)
+        start = time.perf_counter()
+        with OCCTrace.span("unify_same_domain"):
+            unifier = self.get_module('ShapeUpgrade').ShapeUpgrade_UnifySameDomain(result, True, True, False)
+            unifier.Build()
+            result = unifier.Shape()
+        timings['unify'] = time.perf_counter() - start
+
+    if separate:
+        result = self.make_compound([result] + [self.get_shape(obj) for obj in separate])
+
+    self.report('INFO', f"{operation} of {len(objects)} objects: " + ", ".join(f"{phase} {t:.2f}s" for phase, t in timings.items()))
+    return result
@@ -0,0 +1,4 @@
+"""Built-in command modules. blenderocc.py indexes the occ_operation functions in
+each module here by reading the source, and executes a module with the addon's
+globals the first time one of its commands runs. Helpers shared between modules
+live in blenderocc/core and are fetched with OCCCommandIndex.core(name)."""
@@ -0,0 +1,9 @@
+@occ_operation('Call AI')
+def call_ai(self, message=None):
+    """Ask the AI assistant about the AI Message, sending the code most related to it.
+    The reply opens in a new text and is copied to the clipboard"""
+    if message is None:
+        message = bpy.context.scene.ai_message
+    OCCAssistant.submit(message)
+    self.report('INFO', OCCAssistant.status)
+    return None
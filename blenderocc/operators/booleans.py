@@ -0,0 +1,13 @@
+boolean_op = OCCCommandIndex.core('wrapper').boolean_op
+
+@occ_operation("Boolean Union", background=True)
+def boolean_union(self):
+    return boolean_op(self, 'Fuse')
+
+@occ_operation("Boolean Intersection", background=True)
+def boolean_intersection(self):
+    return boolean_op(self, 'Common')
+
+@occ_operation("Boolean Difference", background=True)
+def boolean_difference(self):
+    return boolean_op(self, 'Cut')
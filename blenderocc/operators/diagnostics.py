@@ -0,0 +1,21 @@
+@occ_operation("Benchmark Solid Builders")
+def benchmark_solid(self, face_counts=(1000, 5000, 20000, 50000)):
+    """Time the shared-topology builder against per-polygon sewing
+    on closed UV spheres of increasing face count"""
+    import time
+    # the benchmark corpus sits next to the package; OCCCommandIndex.root resolves symlinks
+    meshes = OCCCommandIndex.load(os.path.join(os.path.dirname(OCCCommandIndex.root), 'benchmarks', 'meshes.py'))
+    lines = [f"{'faces':>8} {'shared (s)':>12} {'sewn (s)':>12}"]
+    for count in face_counts:
+        buffers = meshes.uv_sphere(count)
+        timings = []
+        for build in (OCCUtils.shared_solid, OCCUtils.sewn_solid):
+            start = time.perf_counter()
+            build(*buffers)
+            timings.append(time.perf_counter() - start)
+        lines.append(f"{len(buffers[1]):>8} {timings[0]:>12.3f} {timings[1]:>12.3f}")
+    report = '\n'.join(lines)
+    print(report)
+    text = bpy.data.texts.get("solid_benchmark.txt") or bpy.data.texts.new("solid_benchmark.txt")
+    text.from_string(report)
+    return None
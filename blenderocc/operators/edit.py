@@ -0,0 +1,18 @@
+@occ_operation("Reload Addon")
+def reload_plugin(self, name='blenderocc'):
+    import addon_utils
+    addon_utils.disable(name)
+    addon_utils.enable(name)
+    print(name, "addon reloaded")
+
+@occ_operation("Open Blenderocc Files")
+def open_files(self):
+    filenames = ['custom_commands.py', 'blenderocc.py', 'prompt.txt', 'ai.sh', 'installer.sh']
+    for filename in filenames:
+        if not bpy.data.texts.get(filename):
+            text = bpy.data.texts.new(filename)
+            template_path = OCCEditOperator.get_template_path()
+            with open(os.path.join(template_path, filename), 'r') as f:
+                text.write(f.read())
+        OCCUtils.switch_to_text(filename)
+    return None
@@ -0,0 +1,19 @@
+@occ_operation("Export SVG")
+def export_svg(self, filepath=None):
+    """Isometric SVG of the active object, depth sorted with back faces culled.
+    Small drawings go to the clipboard, larger ones to a file next to the .blend"""
+    obj = self.context.active_object
+    if not obj:
+        return None
+    exporter = OCCSVGExporter()
+    buffers = OCCUtils.mesh_buffers(obj)
+    if filepath is None and len(buffers[1]) <= exporter.clipboard_faces:
+        stream = io.StringIO()
+        exporter.write(stream, *buffers)
+        bpy.context.window_manager.clipboard = stream.getvalue()
+        return None
+    filepath = filepath or os.path.join(bpy.path.abspath('//') or OCCEditOperator.get_template_path(), f"{obj.name}.svg")
+    with open(filepath, 'w') as f:
+        drawn = exporter.write(f, *buffers)
+    self.report('INFO', f"Saved {drawn} faces to {filepath}")
+    return None
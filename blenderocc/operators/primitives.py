@@ -0,0 +1,4 @@
+@occ_operation("Create Cube", background=True)
+def make_cube(self, size=1.0):
+    BRepPrimAPI = self.get_module('BRepPrimAPI')
+    return BRepPrimAPI.BRepPrimAPI_MakeBox(size, size, size).Shape()
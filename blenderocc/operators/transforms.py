@@ -0,0 +1,8 @@
+@occ_operation("Rotate 90°", transform=True)
+def rotate_90(self):
+    """Rotate the active object 90° about the world Z axis"""
+    gp = self.get_module('gp')
+    angle = np.pi/2
+    transform = gp.gp_Trsf()
+    transform.SetRotation(gp.gp_Ax1(gp.gp_Pnt(0,0,0), gp.gp_Dir(0,0,1)), angle)
+    return transform
@@ -0,0 +1,227 @@
+"""Run a command over many mesh files in a process pool.
+
+    python occ_batch.py manifest.txt boolean_union --out results --format brep
+    ./blender.sh --background --python occ_batch.py -- manifest.txt rotate_90 --out results
+
+Each manifest line lists the STL/OBJ files of one job, the first being the active
+object. A .json manifest holds a list whose items are a path or a list of paths.
+Every worker process loads the addon and the commands once and keeps its own OCC
+state. Workers use the real bpy when it is importable and benchmarks/fake_bpy.py
+otherwise. report.json in the output directory is rewritten after every job, and
+rerunning the same command skips the jobs it records as done."""
+import argparse
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+_worker = None
+
+def read_manifest(path):
+    with open(path) as f:
+        if path.endswith('.json'):
+            entries = json.load(f)
+        else:
+            entries = [line.split() for line in f if line.strip() and not line.startswith('#')]
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = {}
+    for number, entry in enumerate(entries, 1):
+        inputs = [os.path.join(base, p) for p in ([entry] if isinstance(entry, str) else entry)]
+        # the path relative to the manifest, extension included, names the job and its output
+        job_id = '+'.join(os.path.relpath(p, base).replace(os.sep, '__') for p in inputs)
+        if job_id in jobs:
+            raise ValueError(f"{path}: job {number} repeats {job_id}")
+        jobs[job_id] = inputs
+    return jobs
+
+def loop_buffers(verts, polys):
+    loop_total = np.array([len(poly) for poly in polys], dtype=np.int32)
+    loop_start = (np.cumsum(loop_total) - loop_total).astype(np.int32)
+    loop_verts = np.concatenate(polys).astype(np.int32) if polys else np.zeros(0, dtype=np.int32)
+    return np.asarray(verts, dtype=np.float64).reshape(-1, 3), loop_start, loop_total, loop_verts
+
+def read_stl(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    count = struct.unpack_from('<I', data, 80)[0] if len(data) >= 84 else 0
+    if len(data) == 84 + count * 50:
+        records = np.frombuffer(data, offset=84, count=count,
+                                dtype=np.dtype([('normal', '<f4', 3), ('verts', '<f4', (3, 3)), ('attr', '<u2')]))
+        corners = records['verts'].reshape(-1, 3)
+    else:
+        corners = np.array([line.split()[1:4] for line in data.decode(errors='replace').splitlines()
+                            if line.strip().startswith('vertex')], dtype=np.float32)
+    # STL repeats every corner per triangle; identical floats are the same vertex
+    verts, inverse = np.unique(corners, axis=0, return_inverse=True)
+    tris = inverse.reshape(-1, 3)
+    return loop_buffers(verts, list(tris))
+
+def read_obj(path):
+    verts, polys = [], []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'v':
+                verts.append([float(x) for x in parts[1:4]])
+            elif parts[0] == 'f':
+                indices = [int(token.split('/')[0]) for token in parts[1:]]
+                polys.append([i - 1 if i > 0 else len(verts) + i for i in indices])
+    return loop_buffers(verts, polys)
+
+def write_obj(path, verts, tris):
+    with open(path, 'w') as f:
+        np.savetxt(f, verts, fmt='v %.9g %.9g %.9g')
+        np.savetxt(f, tris + 1, fmt='f %d %d %d')
+
+def write_stl(path, verts, tris):
+    corners = verts[tris]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-30)
+    records = np.zeros(len(tris), dtype=np.dtype([('normal', '<f4', 3), ('verts', '<f4', (3, 3)), ('attr', '<u2')]))
+    records['normal'] = normals
+    records['verts'] = corners
+    with open(path, 'wb') as f:
+        f.write(b'blenderocc'.ljust(80, b' '))
+        f.write(struct.pack('<I', len(tris)))
+        f.write(records.tobytes())
+
+readers = {'.stl': read_stl, '.obj': read_obj}
+writers = {'obj': write_obj, 'stl': write_stl}
+
+def init_worker(commands_path):
+    """Load bpy (or the stand-in), the addon and the commands once per process"""
+    global _worker
+    import importlib.util
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    try:
+        import bpy
+    except ImportError:
+        import fake_bpy
+        bpy = fake_bpy.install()
+    spec = importlib.util.spec_from_file_location('blenderocc', os.path.join(ROOT, 'blenderocc.py'))
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules['blenderocc'] = addon
+    spec.loader.exec_module(addon)
+    text_name = addon.OCCCommandRegistry.text_name
+    text = bpy.data.texts.get(text_name) or bpy.data.texts.new(text_name)
+    with open(commands_path) as f:
+        text.from_string(f.read())
+    addon.OCCCommandRegistry.load()
+    _worker = (addon, bpy)
+
+def run_job(job_id, inputs, operation, out_dir, fmt, level):
+    from meshes import make_object
+    addon, bpy = _worker
+    start = time.perf_counter()
+    objects = []
+    try:
+        for path in inputs:
+            reader = readers[os.path.splitext(path)[1].lower()]
+            objects.append(make_object(bpy, os.path.basename(path), reader(path)))
+        func = addon.OCCCommandRegistry.get(operation)
+        if func is None:
+            raise KeyError(f"No occ_operation named {operation}")
+        context = SimpleNamespace(selected_objects=objects, active_object=objects[0], scene=bpy.context.scene)
+        wrapper = addon.OCCWrapper(context=context)
+        with addon.OCCTrace.span(job_id):
+            shape = func(wrapper)
+            if func.transform and shape is not None:
+                moved = addon.OCCUtils.transformed_object(objects[0], addon.OCCUtils.trsf_matrix(shape), job_id, bake=True)
+                objects.append(moved)
+                shape = wrapper.get_shape(moved)
+            if shape is None:
+                raise RuntimeError("; ".join(m for _, m in wrapper.messages) or "Operation returned no shape")
+            output = os.path.join(out_dir, f"{job_id}.{fmt}")
+            if fmt == 'brep':
+                addon.OCCModules.get('BinTools').bintools.Write(shape, output)
+            else:
+                verts, tris = addon.OCCUtils.shape_to_arrays(shape, weld=True, level=level)
+                writers[fmt](output, verts, tris)
+        trace = addon.OCCTrace.operations[-1]
+        return {
+            'status': 'done',
+            'output': output,
+            'seconds': time.perf_counter() - start,
+            'stages': {record['name']: record['seconds'] for depth, record in addon.OCCTrace.walk(trace) if depth == 1},
+            'messages': [m for _, m in wrapper.messages],
+        }
+    finally:
+        for obj in objects:
+            mesh = obj.data
+            bpy.data.objects.remove(obj)
+            bpy.data.meshes.remove(mesh)
+        addon.OCCShapeCache.clear()
+        addon.OCCTessellation.clear()
+
+def same_run(entry, args):
+    """Whether a report entry was made by this operation and output format"""
+    return entry.get('operation') == args.operation and entry.get('format') == args.format
+
+def save_report(path, report):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(report, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('manifest')
+    parser.add_argument('operation', help="name of an occ_operation function")
+    parser.add_argument('--out', default='occ_batch_out')
+    parser.add_argument('--format', choices=['brep', 'obj', 'stl'], default='brep')
+    parser.add_argument('--level', default='medium', help="tessellation level for mesh output")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--commands', default=os.path.join(ROOT, 'custom_commands.py'))
+    parser.add_argument('--retry-failed', action='store_true', help="rerun jobs that failed last time")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    report_path = os.path.join(args.out, 'report.json')
+    report = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    jobs = read_manifest(args.manifest)
+    skip = {'done', 'failed'} if not args.retry_failed else {'done'}
+    pending = {job_id: inputs for job_id, inputs in jobs.items()
+               if report.get(job_id, {}).get('status') not in skip
+               or not same_run(report[job_id], args)
+               or (report[job_id].get('output') and not os.path.exists(report[job_id]['output']))}
+    print(f"{len(pending)} of {len(jobs)} jobs to run")
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=init_worker, initargs=(args.commands,)) as pool:
+        futures = {pool.submit(run_job, job_id, inputs, args.operation, os.path.abspath(args.out), args.format, args.level): job_id
+                   for job_id, inputs in pending.items()}
+        for future in as_completed(futures):
+            job_id = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = {'status': 'failed', 'error': str(e),
+                         'traceback': ''.join(traceback.format_exception(type(e), e, e.__traceback__))}
+            entry['inputs'] = jobs[job_id]
+            entry['operation'] = args.operation
+            entry['format'] = args.format
+            report[job_id] = entry
+            save_report(report_path, report)
+            print(f"{entry['status']:>6} {job_id} {entry.get('seconds', 0):.2f}s {entry.get('error', '')}")
+
+    current = [report[job_id] for job_id in jobs if job_id in report and same_run(report[job_id], args)]
+    failed = sum(entry['status'] == 'failed' for entry in current)
+    print(f"{len(current) - failed} done, {failed} failed, report in {report_path}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.path.insert(0, ROOT)
+    import occ_batch
+    sys.exit(occ_batch.main(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]))